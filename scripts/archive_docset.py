@@ -0,0 +1,211 @@
+# Archive a docset as a .tgz (for distribution, see https://kapeli.com/docsets#dashdocsetfeed),
+# compressing it on several cores, and reproducibly: the same docset always produces the same
+# bytes, whenever and wherever it's archived, so an archive can be cached (or its upload
+# skipped) by its hash, which is written alongside it.
+#
+# For reproducibility, members are added in sorted order, with their ownership and
+# timestamps normalised (to SOURCE_DATE_EPOCH, if that's set) and their permissions reduced
+# to whether they're executable. Files hardlinked to each other (see dedup_docset.py) are
+# stored as links, like tar does.
+#
+# For speed, the tar stream is cut into chunks that are compressed in parallel, each into a
+# gzip member of its own. A gzip file may consist of several members, which are decompressed
+# as if they were one, so the result is a standard .tgz (much as pigz's "independent" mode
+# makes), at the cost of a slightly worse compression ratio.
+#
+# REF: https://reproducible-builds.org/docs/archives/
+# REF: https://www.rfc-editor.org/rfc/rfc1952#section-2.2
+
+import argparse
+import hashlib
+import logging
+import os
+import struct
+import tarfile
+import time
+import zlib
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from indexing_report import mib
+
+logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.INFO)
+
+EXCLUDED_NAMES = {".DS_Store"}
+
+# A gzip member header with no timestamp, filename or extra fields, marked as made on Unix
+# regardless of where it was.
+GZIP_HEADER_START = b"\x1f\x8b\x08\x00\x00\x00\x00\x00"
+GZIP_OS_UNIX = b"\x03"
+
+
+# Compress a chunk of the tar stream into a gzip member of its own.
+# NOTE: zlib releases the GIL while it compresses, so chunks are compressed in parallel by
+#       threads.
+def gzip_member(chunk: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(chunk) + compressor.flush()
+    # The "extra flags" say whether the slowest or fastest compression was used.
+    extra_flags = b"\x02" if level == 9 else b"\x04" if level == 1 else b"\x00"
+    return (
+        GZIP_HEADER_START
+        + extra_flags
+        + GZIP_OS_UNIX
+        + deflated
+        + struct.pack("<II", zlib.crc32(chunk), len(chunk) & 0xFFFFFFFF)
+    )
+
+
+# Normalise a member's metadata, so that it doesn't depend on who built the docset, when, or
+# with what umask.
+def normalised(tarinfo: tarfile.TarInfo, mtime: int) -> tarfile.TarInfo:
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ""
+    tarinfo.mtime = mtime
+    tarinfo.mode = 0o755 if tarinfo.isdir() or tarinfo.mode & 0o100 else 0o644
+    return tarinfo
+
+
+# The paths to archive, in order: each directory is followed by its contents.
+def member_paths(docset_path: Path) -> list[Path]:
+    return [docset_path] + sorted(
+        path
+        for path in docset_path.rglob("*")
+        if not EXCLUDED_NAMES.intersection(path.relative_to(docset_path).parts)
+    )
+
+
+# Receives the tar stream, and hands it on in chunks.
+class ChunkWriter:
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.chunks: deque[bytes] = deque()
+
+    def write(self, b: bytes) -> int:
+        self.buffer += b
+        while len(self.buffer) >= self.chunk_size:
+            self.chunks.append(bytes(self.buffer[: self.chunk_size]))
+            del self.buffer[: self.chunk_size]
+        return len(b)
+
+    # Take the chunks written so far (including a final partial one, if `final`).
+    def take(self, final: bool = False) -> Iterator[bytes]:
+        if final and self.buffer:
+            self.chunks.append(bytes(self.buffer))
+            self.buffer.clear()
+        while self.chunks:
+            yield self.chunks.popleft()
+
+
+def archive_docset(
+    docset_path: Path,
+    archive_path: Path,
+    jobs: int,
+    level: int,
+    chunk_size: int,
+    mtime: int,
+) -> str:
+    started = time.perf_counter()
+    tar_size = 0
+    archive_size = 0
+    digest = hashlib.sha256()
+    temporary_path = archive_path.with_name(f".{archive_path.name}.tmp")
+    chunk_writer = ChunkWriter(chunk_size)
+    pending: deque[Future[bytes]] = deque()
+
+    with ThreadPoolExecutor(jobs) as executor, open(temporary_path, "wb") as f:
+
+        def submit(final: bool = False) -> None:
+            nonlocal tar_size, archive_size
+            for chunk in chunk_writer.take(final):
+                tar_size += len(chunk)
+                pending.append(executor.submit(gzip_member, chunk, level))
+            # Write out the members that are done, in order, keeping at most a couple of
+            # chunks per job in flight.
+            while pending and (final or pending[0].done() or len(pending) > 2 * jobs):
+                member = pending.popleft().result()
+                f.write(member)
+                digest.update(member)
+                archive_size += len(member)
+
+        with tarfile.open(
+            fileobj=chunk_writer,  # pyright: ignore[reportArgumentType]
+            mode="w|",
+            format=tarfile.PAX_FORMAT,
+        ) as tar:
+            for path in member_paths(docset_path):
+                tar.add(
+                    path,
+                    arcname=path.relative_to(docset_path.parent).as_posix(),
+                    recursive=False,
+                    filter=lambda tarinfo: normalised(tarinfo, mtime),
+                )
+                submit()
+        submit(final=True)
+    os.replace(temporary_path, archive_path)
+
+    hexdigest = digest.hexdigest()
+    # In the format of sha256sum, so that `sha256sum --check` can verify the archive.
+    archive_path.with_name(f"{archive_path.name}.sha256").write_text(
+        f"{hexdigest}  {archive_path.name}\n"
+    )
+    elapsed = time.perf_counter() - started
+    logging.info(
+        "%s was archived in %.2fs (%.1fMB/s): %s compressed to %s (%.1f%%), sha256 %s",
+        docset_path,
+        elapsed,
+        tar_size / elapsed / 1e6 if elapsed else 0.0,
+        mib(tar_size),
+        mib(archive_size),
+        100 * archive_size / tar_size if tar_size else 0.0,
+        hexdigest,
+    )
+    return hexdigest
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("docset_path", type=Path)
+    arg_parser.add_argument("archive_path", type=Path)
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of threads to compress with (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--level",
+        type=int,
+        choices=range(1, 10),
+        default=6,
+        metavar="{1..9}",
+        help="gzip compression level (default: %(default)s, as for gzip itself)",
+    )
+    arg_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1,
+        metavar="MIB",
+        help="size of the chunks of the tar stream that are compressed independently, in MiB (default: %(default)s)",
+    )
+    args = arg_parser.parse_args()
+    # NOTE: Otherwise, `ChunkWriter` would never stop cutting chunks.
+    if args.chunk_size < 1:
+        arg_parser.error("--chunk-size must be at least 1 (MiB)")
+    archive_docset(
+        args.docset_path,
+        args.archive_path,
+        args.jobs,
+        args.level,
+        args.chunk_size * 2**20,
+        # REF: https://reproducible-builds.org/specs/source-date-epoch/
+        int(os.environ.get("SOURCE_DATE_EPOCH", "0")),
+    )
+
+
+if __name__ == "__main__":
+    main()
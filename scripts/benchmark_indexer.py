@@ -0,0 +1,215 @@
+# Benchmark the indexer against a synthetic manual (see synthesize_manual.py), and record
+# the results as JSON, named after the commit that was benchmarked, so that they can be
+# compared across commits.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from functools import partial
+from pathlib import Path
+from typing import TypeVar
+
+from bs4.builder import builder_registry
+
+import index_manual
+from index_manual import Markup, ParserBackend
+from synthesize_manual import MANUAL_CONTAINER_BASENAME, synthesize
+
+SCRIPTS_PATH = Path(__file__).parent
+
+T = TypeVar("T")
+
+
+def measure(
+    repeat: int, setup: Callable[[], T], run: Callable[[T], object]
+) -> dict[str, float | list[float]]:
+    # Only `run` is timed; `setup` prepares a fresh input for each run.
+    runs: list[float] = []
+    for _ in range(repeat):
+        arg = setup()
+        started = time.perf_counter()
+        run(arg)
+        runs.append(time.perf_counter() - started)
+        index_manual.page_index_rows.clear()
+    return {"median_s": statistics.median(runs), "min_s": min(runs), "runs": runs}
+
+
+def commit_id() -> str:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            cwd=SCRIPTS_PATH,
+            capture_output=True,
+            text=True,
+            check=False,
+        ).stdout.strip()
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    return (
+        f"{commit}-dirty"
+        if git("status", "--porcelain", "--untracked-files=no")
+        else commit
+    )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "-n",
+        "--modules",
+        type=int,
+        default=200,
+        help="number of modules in the synthetic manual (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of times to run each benchmark (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--results-path",
+        type=Path,
+        default=Path("generated/benchmarks"),
+        help="directory to write the results to (default: %(default)s)",
+    )
+    args = arg_parser.parse_args()
+    repeat: int = args.repeat
+
+    results: dict[str, dict[str, float | list[float]]] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = Path(tmp) / "corpus"
+        synthesize(corpus_path, args.modules)
+        pages = sorted(
+            path
+            for path in corpus_path.rglob("*.html")
+            if not path.match("**/compilerlibref/*")
+        )
+        internal_paths = [page.relative_to(corpus_path) for page in pages]
+        page_exists = partial(index_manual.page_exists_in, corpus_path)
+
+        def parsed(
+            backend: ParserBackend, pages: list[Path]
+        ) -> Callable[[], list[Markup]]:
+            rewrite_mode = backend.default_rewrite_mode()
+            return lambda: [
+                Markup(page.read_text(), backend, rewrite_mode) for page in pages
+            ]
+
+        backends = [
+            b
+            for b in ParserBackend
+            if b != ParserBackend.LXML or builder_registry.lookup("lxml") is not None
+        ]
+        for backend in backends:
+            results[f"process_page[{backend}]"] = measure(
+                repeat,
+                lambda: [page.read_text() for page in pages],
+                lambda markups, backend=backend: [
+                    index_manual.process_page(
+                        markup,
+                        internal,
+                        backend,
+                        backend.default_rewrite_mode(),
+                        page_exists,
+                    )
+                    for markup, internal in zip(markups, internal_paths)
+                ],
+            )
+
+        # The pages that each handler applies to, and what it's passed for them.
+        module_pages = [
+            (page, internal, page.stem)
+            for page, internal in zip(pages, internal_paths)
+            if page.parent.name == "libref" and page.stem.startswith("Synth")
+        ]
+        library_pages = [
+            (page, internal, page.stem.removeprefix("lib"))
+            for page, internal in zip(pages, internal_paths)
+            if page.parent.name == MANUAL_CONTAINER_BASENAME
+            and page.stem.startswith("lib")
+        ]
+        for handler_name, handler, handled_pages in [
+            ("handle_module", index_manual.handle_module, module_pages),
+            ("handle_library", index_manual.handle_library, library_pages),
+        ]:
+            for backend in backends:
+                results[f"{handler_name}[{backend}]"] = measure(
+                    repeat,
+                    parsed(backend, [page for page, _, _ in handled_pages]),
+                    lambda soups, handler=handler, handled_pages=handled_pages: [
+                        handler(internal, name, soup)
+                        for (_, internal, name), soup in zip(handled_pages, soups)
+                    ],
+                )
+
+        docset_path = Path(tmp) / "docset"
+        for jobs in sorted({1, os.cpu_count() or 1}):
+            for backend in backends:
+
+                def fresh_docset() -> None:
+                    shutil.rmtree(docset_path, ignore_errors=True)
+                    shutil.copytree(corpus_path, docset_path)
+
+                def index(
+                    _: None, jobs: int = jobs, backend: ParserBackend = backend
+                ) -> None:
+                    subprocess.run(
+                        [
+                            sys.executable,
+                            SCRIPTS_PATH / "index_manual.py",
+                            f"--jobs={jobs}",
+                            f"--parser={backend}",
+                            docset_path,
+                            Path(tmp) / "docSet.dsidx",
+                        ],
+                        check=True,
+                        capture_output=True,
+                    )
+
+                results[f"end_to_end[{backend},jobs={jobs}]"] = measure(
+                    repeat, fresh_docset, index
+                )
+
+        corpus = {
+            "modules": args.modules,
+            "pages": len(pages),
+            "bytes": sum(page.stat().st_size for page in pages),
+        }
+
+    commit = commit_id()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rewrite_modes": {b: b.default_rewrite_mode() for b in backends},
+        "corpus": corpus,
+        "benchmarks": results,
+    }
+    results_path: Path = args.results_path
+    results_path.mkdir(parents=True, exist_ok=True)
+    report_path = results_path / f"{commit}.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    for name, result in results.items():
+        print(f"{name:45} {result['median_s']:8.3f}s")
+    print(f"Results were written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
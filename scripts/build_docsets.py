@@ -0,0 +1,153 @@
+# Build a docset for each of several OCaml versions in one run. Each version's manual is
+# read from its downloaded ocaml-<version>-refman-html.tar.gz archive, and a complete
+# .docset (Documents, docSet.dsidx and Info.plist) is written for it and verified (see
+# verify_anchors.py), along with its table of redirects (see redirect_table.py). A static
+# _redirects file covering every version is also written. Finally, the docsets are
+# deduplicated together (see dedup_docset.py).
+#
+# NOTE: Most pages of the manual don't change between consecutive releases. All versions are
+#       indexed through the same page cache, which is keyed by each page's content (and
+#       path), so a page that is identical to one in an already-indexed version is not
+#       parsed again: its index rows and rewritten HTML are replayed instead.
+
+import argparse
+import logging
+import multiprocessing
+import shutil
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+
+from dedup_docset import dedup_docsets
+from describe_docset import describe_docset
+from index_manual import (
+    add_indexing_arguments,
+    index_docset,
+    indexing_options,
+    open_page_cache,
+)
+from redirect_table import write_redirect_table, write_static_redirects
+from verify_anchors import check_docset
+
+DOCSET_BASENAME_NO_EXT = "ocaml-unofficial"
+DOCSET_READABLE_NAME = "OCaml (Unofficial)"
+DOCSET_SEARCH_KEYWORD = "ocaml"
+# See ./gcp/main.py
+ONLINE_PAGE_BASE_URL = "https://ocaml-docset-redirect.faas.frou.org/{version}/"
+
+
+def manual_archive_path(downloads_path: Path, version: str) -> Path:
+    return downloads_path / f"ocaml-{version}-refman-html.tar.gz"
+
+
+def docset_path(generated_path: Path, version: str) -> Path:
+    return generated_path / version / f"{DOCSET_BASENAME_NO_EXT}.docset"
+
+
+# Make a per-version variant of a path given on the command line.
+def versioned(path: Path | None, version: str) -> Path | None:
+    if path is None:
+        return None
+    return path.with_name(f"{path.stem}-{version}{path.suffix}")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "versions", nargs="+", help="OCaml versions to build a docset for"
+    )
+    arg_parser.add_argument(
+        "--downloads-path",
+        type=Path,
+        default=Path("downloads"),
+        help="directory containing each version's ocaml-<version>-refman-html.tar.gz (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--generated-path",
+        type=Path,
+        default=Path("generated"),
+        help="directory to write each version's docset to, in a subdirectory named after the version (default: %(default)s)",
+    )
+    add_indexing_arguments(arg_parser)
+    arg_parser.add_argument(
+        "--drop-unreferenced",
+        action="store_true",
+        help="drop pages that nothing indexes or links to from the docsets (see dedup_docset.py)",
+    )
+    args = arg_parser.parse_args()
+    options = indexing_options(arg_parser, args)
+    container: str = options.archive_container
+    versions: list[str] = args.versions
+
+    for version in versions:
+        if not (
+            archive_path := manual_archive_path(args.downloads_path, version)
+        ).exists():
+            arg_parser.error(
+                f"the manual for OCaml {version} is missing: {archive_path}"
+            )
+
+    # Without a persistent cache, an in-memory one still lets versions share pages.
+    cache = open_page_cache(args.cache or ":memory:", options)
+    redirect_tables: list[dict[str, str]] = []
+    with (
+        multiprocessing.Pool(options.jobs)
+        if options.jobs > 1
+        else nullcontext() as pool
+    ):
+        for version in versions:
+            resources_path = (
+                docset_path(args.generated_path, version) / "Contents/Resources"
+            )
+            documents_path = resources_path / "Documents"
+            shutil.rmtree(documents_path, ignore_errors=True)
+            documents_path.mkdir(parents=True)
+            logging.getLogger().setLevel(logging.INFO)
+            logging.info("indexing the manual for OCaml %s", version)
+            logging.getLogger().setLevel(logging.WARNING)
+            index_docset(
+                documents_path,
+                resources_path / "docSet.dsidx",
+                options._replace(
+                    archive_path=manual_archive_path(args.downloads_path, version),
+                    report_path=versioned(options.report_path, version),
+                    jsonl_path=versioned(options.jsonl_path, version),
+                    profile_dir=options.profile_dir and options.profile_dir / version,
+                ),
+                cache,
+                pool,
+            )
+            logging.getLogger().setLevel(logging.INFO)
+            if not check_docset(
+                documents_path, resources_path / "docSet.dsidx", options.jobs
+            ):
+                sys.exit(1)
+            logging.getLogger().setLevel(logging.WARNING)
+            describe_docset(
+                DOCSET_BASENAME_NO_EXT,
+                DOCSET_READABLE_NAME,
+                DOCSET_SEARCH_KEYWORD,
+                f"{container}/index.html",
+                ONLINE_PAGE_BASE_URL.format(version=version),
+                str(resources_path.parent / "Info.plist"),
+            )
+            redirect_tables.append(
+                write_redirect_table(
+                    version,
+                    documents_path,
+                    args.generated_path / version / f"redirects-{version}.json",
+                )
+            )
+    write_static_redirects(redirect_tables, args.generated_path / "_redirects")
+    cache.close()
+
+    logging.getLogger().setLevel(logging.INFO)
+    dedup_docsets(
+        [docset_path(args.generated_path, version) for version in versions],
+        args.drop_unreferenced,
+    )
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Shrink built docsets by deduplicating their Documents: files with identical contents are
+# replaced with hardlinks to a single copy of them. Deduplicating several docsets together
+# (e.g. those for different OCaml versions, see build_docsets.py) also links the many pages
+# that are unchanged between them. tar stores each further link to a file as a link rather
+# than another copy of it, so the docsets' archives shrink too, as do the docsets once Dash
+# has extracted them.
+#
+# Optionally, pages that nothing indexes or links to (within the docset) can also be dropped.
+#
+# NOTE: Hardlinked files share their contents, so writing to one of them in place would
+#       change the others too. Docsets are therefore always built into an empty Documents
+#       directory, and this is the last step in building them.
+
+import argparse
+import hashlib
+import logging
+import os
+import plistlib
+import re
+import sqlite3
+import urllib.parse
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from indexing_report import mib
+
+logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.WARNING)
+
+PAGE_ENCODING = "utf-8"
+# The targets of links (and of other references, like to stylesheets and images) in a page.
+RE_REFERENCE = re.compile(
+    r"""\s(?:href|src)\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE
+)
+
+
+class Docset(NamedTuple):
+    documents_path: Path
+    indexdb_path: Path
+    info_path: Path
+
+
+def docset_at(path: Path) -> Docset:
+    resources_path = path / "Contents/Resources"
+    return Docset(
+        resources_path / "Documents",
+        resources_path / "docSet.dsidx",
+        path / "Contents/Info.plist",
+    )
+
+
+class Savings(NamedTuple):
+    files: int
+    bytes: int
+
+
+# The pages (by path within Documents) that are referenced by the docset's index, by its
+# Info.plist (as its main page), or by a link from any other of its pages.
+def referenced_pages(docset: Docset) -> set[str]:
+    with sqlite3.connect(docset.indexdb_path) as db:
+        referenced = {
+            urllib.parse.urldefrag(path).url
+            for (path,) in db.execute("SELECT DISTINCT path FROM searchIndex")
+        }
+    with open(docset.info_path, "rb") as f:
+        referenced.add(plistlib.load(f)["dashIndexFilePath"])
+    for page_path in docset.documents_path.rglob("*.html"):
+        page = page_path.relative_to(docset.documents_path)
+        markup = page_path.read_text(encoding=PAGE_ENCODING, errors="replace")
+        for match in RE_REFERENCE.finditer(markup):
+            target = urllib.parse.urlsplit(match[1] or match[2] or "")
+            if target.scheme or target.netloc or not target.path:
+                continue
+            referenced_page = os.path.normpath(
+                page.parent / urllib.parse.unquote(target.path)
+            )
+            if referenced_page != page.as_posix():
+                referenced.add(referenced_page)
+    return referenced
+
+
+def drop_unreferenced_pages(docset: Docset) -> Savings:
+    referenced = referenced_pages(docset)
+    dropped = Savings(0, 0)
+    for page_path in sorted(docset.documents_path.rglob("*.html")):
+        if page_path.relative_to(docset.documents_path).as_posix() not in referenced:
+            logging.debug("dropping %s", page_path)
+            dropped = Savings(
+                dropped.files + 1, dropped.bytes + page_path.stat().st_size
+            )
+            page_path.unlink()
+    return dropped
+
+
+# Replace each file that has the same contents as another with a hardlink to it.
+def link_duplicates(documents_paths: Iterable[Path]) -> Savings:
+    # NOTE: Only files that are the same size can be identical, so only those are hashed.
+    by_size: defaultdict[int, list[Path]] = defaultdict(list)
+    for documents_path in documents_paths:
+        for path in sorted(documents_path.rglob("*")):
+            if path.is_file() and not path.is_symlink():
+                by_size[path.stat().st_size].append(path)
+
+    linked = Savings(0, 0)
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        by_digest: defaultdict[bytes, list[Path]] = defaultdict(list)
+        for path in paths:
+            with open(path, "rb") as f:
+                by_digest[hashlib.file_digest(f, "sha256").digest()].append(path)
+        for original, *duplicates in by_digest.values():
+            for duplicate in duplicates:
+                if duplicate.samefile(original):
+                    continue
+                # Link under a temporary name first, so that the duplicate is replaced
+                # atomically.
+                temporary_path = duplicate.with_name(f".{duplicate.name}.dedup")
+                try:
+                    os.link(original, temporary_path)
+                except OSError as e:
+                    logging.warning(
+                        "couldn't link %s to %s: %s", duplicate, original, e
+                    )
+                    continue
+                os.replace(temporary_path, duplicate)
+                linked = Savings(linked.files + 1, linked.bytes + size)
+    return linked
+
+
+# Deduplicate the docsets together, after dropping their unreferenced pages if asked to.
+def dedup_docsets(docset_paths: list[Path], drop_unreferenced: bool) -> None:
+    docsets = [docset_at(path) for path in docset_paths]
+    if drop_unreferenced:
+        for path, docset in zip(docset_paths, docsets):
+            dropped = drop_unreferenced_pages(docset)
+            logging.info(
+                "%d unreferenced pages (%s) were dropped from %s",
+                dropped.files,
+                mib(dropped.bytes),
+                path,
+            )
+    linked = link_duplicates(docset.documents_path for docset in docsets)
+    logging.info(
+        "%d duplicate files were replaced with hardlinks, saving %s",
+        linked.files,
+        mib(linked.bytes),
+    )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "docset_paths",
+        nargs="+",
+        type=Path,
+        help="paths of .docset directories, which are deduplicated together",
+    )
+    arg_parser.add_argument(
+        "--drop-unreferenced",
+        action="store_true",
+        help="first remove pages that aren't in the index, aren't the main page, and aren't linked to from any other page",
+    )
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    dedup_docsets(args.docset_paths, args.drop_unreferenced)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# Summarise how one docset index database (docSet.dsidx) differs from another, e.g. how a
+# change to the indexer has changed the index of the manual (see `make stash-db diff-dbs`).
+#
+# An entry (name, type, path) is either added, removed, or re-categorised (its name and path
+# are unchanged, but not its type). The changes are counted per type and per page, entirely
+# within SQLite (with the databases attached side by side), so that even full-size indexes
+# are compared in a fraction of a second. For the entries themselves, see ./compare_dbs.
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+# NOTE: An entry removed from one type and added to another, under the same name and path, is
+#       counted as re-categorised rather than as both. Where there are several such entries
+#       under the same name and path, they're paired off one-to-one (in order of type), and
+#       any left over are counted as removed or added.
+CHANGES_SQL = """
+CREATE TEMP TABLE removed AS
+    SELECT name, type, path, ROW_NUMBER() OVER (PARTITION BY name, path ORDER BY type) AS n
+    FROM (
+        SELECT name, type, path FROM old.searchIndex
+        EXCEPT SELECT name, type, path FROM new.searchIndex
+    );
+CREATE TEMP TABLE added AS
+    SELECT name, type, path, ROW_NUMBER() OVER (PARTITION BY name, path ORDER BY type) AS n
+    FROM (
+        SELECT name, type, path FROM new.searchIndex
+        EXCEPT SELECT name, type, path FROM old.searchIndex
+    );
+CREATE INDEX temp.removed_key ON removed (name, path, n);
+CREATE INDEX temp.added_key ON added (name, path, n);
+CREATE TEMP TABLE changes AS
+    SELECT 'recategorised' AS change, name, removed.type AS old_type, added.type AS new_type, path
+    FROM removed JOIN added USING (name, path, n)
+    UNION ALL
+    SELECT 'removed', name, type, NULL, path FROM removed
+    WHERE NOT EXISTS (
+        SELECT 1 FROM added
+        WHERE added.name = removed.name AND added.path = removed.path AND added.n = removed.n
+    )
+    UNION ALL
+    SELECT 'added', name, NULL, type, path FROM added
+    WHERE NOT EXISTS (
+        SELECT 1 FROM removed
+        WHERE removed.name = added.name AND removed.path = added.path AND removed.n = added.n
+    );
+"""
+
+TOTALS_SQL = """
+SELECT
+    (SELECT COUNT(*) FROM old.searchIndex),
+    (SELECT COUNT(*) FROM new.searchIndex),
+    COUNT(*) FILTER (WHERE change = 'added'),
+    COUNT(*) FILTER (WHERE change = 'removed'),
+    COUNT(*) FILTER (WHERE change = 'recategorised')
+FROM changes
+"""
+
+# Per type, the entries added to and removed from it, counting re-categorised entries for
+# both their old and new types.
+PER_TYPE_SQL = """
+SELECT type, SUM(added), SUM(removed) FROM (
+    SELECT new_type AS type, 1 AS added, 0 AS removed FROM changes WHERE new_type IS NOT NULL
+    UNION ALL
+    SELECT old_type, 0, 1 FROM changes WHERE old_type IS NOT NULL
+)
+GROUP BY type ORDER BY type
+"""
+
+RECATEGORISATIONS_SQL = """
+SELECT old_type, new_type, COUNT(*) FROM changes WHERE change = 'recategorised'
+GROUP BY old_type, new_type ORDER BY COUNT(*) DESC, old_type, new_type
+"""
+
+# The pages with the most changes, with their paths' fragments stripped.
+PER_PAGE_SQL = """
+SELECT
+    substr(path, 1, instr(path || '#', '#') - 1) AS page,
+    COUNT(*) FILTER (WHERE change = 'added'),
+    COUNT(*) FILTER (WHERE change = 'removed'),
+    COUNT(*) FILTER (WHERE change = 'recategorised')
+FROM changes
+GROUP BY page ORDER BY COUNT(*) DESC, page LIMIT ?
+"""
+
+
+def diff_dbs(old_path: Path, new_path: Path, pages_limit: int) -> dict[str, Any]:
+    db = sqlite3.connect(":memory:", uri=True)
+    for schema, path in [("old", old_path), ("new", new_path)]:
+        # NOTE: Attached read-only, and it's an error for the database not to exist.
+        db.execute("ATTACH ? AS " + schema, (f"{path.resolve().as_uri()}?mode=ro",))
+    db.executescript(CHANGES_SQL)
+    old_total, new_total, added, removed, recategorised = db.execute(
+        TOTALS_SQL
+    ).fetchone()
+    return {
+        "old": {"path": str(old_path), "entries": old_total},
+        "new": {"path": str(new_path), "entries": new_total},
+        "added": added,
+        "removed": removed,
+        "recategorised": recategorised,
+        "types": {
+            type_: {"added": type_added, "removed": type_removed}
+            for type_, type_added, type_removed in db.execute(PER_TYPE_SQL)
+        },
+        "recategorisations": [
+            {"from": old_type, "to": new_type, "entries": count}
+            for old_type, new_type, count in db.execute(RECATEGORISATIONS_SQL)
+        ],
+        "pages": [
+            {
+                "page": page,
+                "added": page_added,
+                "removed": page_removed,
+                "recategorised": page_recategorised,
+            }
+            for page, page_added, page_removed, page_recategorised in db.execute(
+                PER_PAGE_SQL, (pages_limit,)
+            )
+        ],
+    }
+
+
+def print_summary(diff: dict[str, Any], elapsed: float) -> None:
+    print(
+        f"{diff['old']['entries']} -> {diff['new']['entries']} entries: "
+        f"{diff['added']} added, {diff['removed']} removed, "
+        f"{diff['recategorised']} re-categorised ({elapsed * 1e3:.0f}ms)"
+    )
+    if diff["types"]:
+        print("\nper type:")
+        for type_, counts in diff["types"].items():
+            print(f"  {type_:12} +{counts['added']:<6} -{counts['removed']}")
+    if diff["recategorisations"]:
+        print("\nre-categorisations:")
+        for r in diff["recategorisations"]:
+            print(f"  {r['from']} -> {r['to']}: {r['entries']}")
+    if diff["pages"]:
+        print("\npages with the most changes:")
+        for p in diff["pages"]:
+            print(f"  {p['page']}: +{p['added']} -{p['removed']} ~{p['recategorised']}")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("old_indexdb_path", type=Path)
+    arg_parser.add_argument("new_indexdb_path", type=Path)
+    arg_parser.add_argument(
+        "--json",
+        type=Path,
+        help="path of a JSON file to write the summary to, or - for standard output",
+    )
+    arg_parser.add_argument(
+        "--pages",
+        type=int,
+        default=20,
+        help="number of the pages with the most changes to detail (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with status 1 if the databases' entries differ",
+    )
+    args = arg_parser.parse_args()
+    for path in [args.old_indexdb_path, args.new_indexdb_path]:
+        if not path.is_file():
+            arg_parser.error(f"no such database: {path}")
+
+    started = time.perf_counter()
+    diff = diff_dbs(args.old_indexdb_path, args.new_indexdb_path, args.pages)
+    elapsed = time.perf_counter() - started
+    if args.json is None:
+        print_summary(diff, elapsed)
+    elif str(args.json) == "-":
+        json.dump(diff, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.json, "w") as f:
+            json.dump(diff, f, indent=2)
+            f.write("\n")
+        print_summary(diff, elapsed)
+    if args.check and (diff["added"] or diff["removed"] or diff["recategorised"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Measure the redirect service's cold start: the time from starting a fresh interpreter to
+# it answering its first request, as a user clicking after an idle period would experience
+# it (platform overheads aside). Each way of serving the service is started afresh a number
+# of times, and polled until it answers.
+
+import argparse
+import http.client
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MAIN_PATH = Path(__file__).with_name("main.py")
+REQUEST_PATH = "/5.2/htmlman/libref/Arg.html"
+
+# How to start each way of serving the service, listening on a given port.
+SERVERS = {
+    # As Cloud Functions does.
+    "functions-framework": lambda port: [
+        sys.executable,
+        "-m",
+        "functions_framework",
+        "--source",
+        str(MAIN_PATH),
+        "--target",
+        "transforming_redirect",
+        "--port",
+        str(port),
+    ],
+    # The plain WSGI app, behind the standard library's WSGI server.
+    "wsgi": lambda port: [sys.executable, __file__, "--serve-wsgi", str(port)],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(server: str) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        SERVERS[server](port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            conn = http.client.HTTPConnection("localhost", port)
+            try:
+                conn.request("GET", REQUEST_PATH)
+                response = conn.getresponse()
+                response.read()
+            except ConnectionRefusedError:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{server} exited with {process.returncode}")
+                time.sleep(0.001)
+                continue
+            finally:
+                conn.close()
+            elapsed = time.perf_counter() - started
+            assert response.status == 302, response.status
+            return elapsed
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def serve_wsgi(port: int) -> None:
+    from wsgiref.simple_server import make_server
+
+    import main as service
+
+    make_server("localhost", port, service.app).serve_forever()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=10,
+        help="number of cold starts to measure for each way of serving (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--server",
+        action="append",
+        choices=list(SERVERS),
+        help="a way of serving the service to measure; may be given more than once (default: all of them)",
+    )
+    arg_parser.add_argument("--serve-wsgi", type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.serve_wsgi is not None:
+        serve_wsgi(args.serve_wsgi)
+        return
+
+    for server in args.server or SERVERS:
+        runs = sorted(time_to_first_response(server) for _ in range(args.repeat))
+        print(
+            f"{server}: time to first response median {statistics.median(runs) * 1e3:.1f}ms, "
+            f"min {runs[0] * 1e3:.1f}ms, max {runs[-1] * 1e3:.1f}ms ({args.repeat} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Load test the redirect service locally, reporting its throughput (requests/sec) and
+# latency percentiles.
+#
+# By default, the service's plain WSGI app (`app` in main.py) is served by a local werkzeug
+# server for the duration of the test. Alternatively, `--target flask` serves it the way that
+# functions-framework does (through Flask), `--url` points the test at a server that's
+# already running (e.g. `make dev`), and `--in-process` takes HTTP out of the picture by
+# calling the WSGI app directly.
+
+import argparse
+import http.client
+import random
+import statistics
+import threading
+import time
+import urllib.parse
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import functions_framework
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.test import create_environ
+
+import main as service
+
+MAIN_PATH = Path(__file__).with_name("main.py")
+
+
+# A mix of requests like those the service receives: mostly for API pages (with a long tail
+# of less popular modules), some for prose pages, and a few that aren't recognised.
+def request_paths(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    modules = [f"Module{i:03d}" for i in range(500)]
+    versions = ["4.14", "5.1", "5.2", "5.3"]
+    paths: list[str] = []
+    for _ in range(count):
+        version = rng.choice(versions)
+        r = rng.random()
+        if r < 0.8:
+            module = modules[min(int(rng.paretovariate(1.2)) - 1, len(modules) - 1)]
+            paths.append(f"/{version}/htmlman/libref/{module}.html")
+        elif r < 0.95:
+            paths.append(f"/{version}/htmlman/chapter{rng.randrange(30)}.html")
+        else:
+            paths.append(f"/{version}/unrecognised")
+    return paths
+
+
+def percentile(sorted_latencies: list[float], p: float) -> float:
+    return sorted_latencies[
+        min(int(len(sorted_latencies) * p), len(sorted_latencies) - 1)
+    ]
+
+
+def report(label: str, latencies: list[float], elapsed: float) -> None:
+    latencies.sort()
+    print(
+        f"{label}: {len(latencies)} requests in {elapsed:.2f}s = {len(latencies) / elapsed:.0f} req/s, "
+        f"latency p50 {percentile(latencies, 0.5) * 1e3:.3f}ms, p99 {percentile(latencies, 0.99) * 1e3:.3f}ms, "
+        f"mean {statistics.fmean(latencies) * 1e3:.3f}ms"
+    )
+
+
+def run_over_http(url: str, paths: list[str], concurrency: int) -> None:
+    parts = urllib.parse.urlsplit(url)
+    assert parts.hostname is not None
+
+    def worker(worker_paths: list[str]) -> list[float]:
+        latencies: list[float] = []
+        conn = http.client.HTTPConnection(parts.hostname, parts.port)
+        for path in worker_paths:
+            started = time.perf_counter()
+            conn.request("GET", parts.path.rstrip("/") + path)
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - started)
+            if response.will_close:
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port)
+        conn.close()
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = executor.map(
+            worker, [paths[i::concurrency] for i in range(concurrency)]
+        )
+        latencies = [latency for result in results for latency in result]
+    report(url, latencies, time.perf_counter() - started)
+
+
+def run_in_process(app: Callable[..., object], label: str, paths: list[str]) -> None:
+    environs = [create_environ(path) for path in paths]
+    latencies: list[float] = []
+
+    def start_response(*_: object) -> None:
+        pass
+
+    started = time.perf_counter()
+    for environ in environs:
+        t = time.perf_counter()
+        for _ in app(environ.copy(), start_response):  # pyright: ignore[reportGeneralTypeIssues]
+            pass
+        latencies.append(time.perf_counter() - t)
+    report(label, latencies, time.perf_counter() - started)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # NOTE: Persistent connections need HTTP/1.1, otherwise each request opens a new one.
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, code: int | str = "-", size: int | str = "-") -> None:
+        pass
+
+
+def wsgi_app(target: str) -> Callable[..., object]:
+    if target == "flask":
+        return functions_framework.create_app(
+            service.transforming_redirect.__name__, str(MAIN_PATH)
+        )
+    return service.app
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "-n",
+        "--requests",
+        type=int,
+        default=20000,
+        help="number of requests to make (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=8,
+        help="number of requests to have in flight at once (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--target",
+        choices=["wsgi", "flask"],
+        default="wsgi",
+        help="how to serve the service: as the plain WSGI app, or through Flask like functions-framework does (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--url",
+        help="base URL of an already running instance of the service to test instead",
+    )
+    arg_parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="call the app directly rather than over HTTP, so that only its own cost is measured",
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    paths = request_paths(args.requests, args.seed)
+
+    if args.url is not None:
+        run_over_http(args.url, paths, args.concurrency)
+        return
+    app = wsgi_app(args.target)
+    if args.in_process:
+        run_in_process(app, f"{args.target} (in process)", paths)
+        return
+    server = make_server(
+        "localhost",
+        0,
+        app,  # pyright: ignore[reportArgumentType]
+        threaded=True,
+        request_handler=QuietRequestHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        run_over_http(f"http://localhost:{server.port}/", paths, args.concurrency)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
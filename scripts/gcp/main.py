@@ -27,16 +27,30 @@
 #
 #     https://ocaml.org/manual/5.2/api/Arg.html
 
-import json
+# NOTE: Since this runs as a function that is scaled to zero when idle, the time taken to
+#       import this module is paid by whoever clicks after an idle period. So only what's
+#       needed on the hot path is imported up front, and everything else (notably Flask,
+#       werkzeug and functions-framework, which take most of that time) is imported where
+#       it's used. See cold_start.py for measuring it.
+
+import re
+import sys
+import time
+from collections.abc import Iterable
 from enum import StrEnum, auto
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 from urllib.parse import urlunsplit
 
-import functions_framework
-import werkzeug.routing as rt
-from flask import Request, redirect
-from flask.typing import ResponseReturnValue
-from werkzeug.exceptions import HTTPException, MethodNotAllowed
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIEnvironment
+    from flask import Request
+    from flask.typing import ResponseReturnValue
+    from werkzeug.wrappers import Response
+
+# When this module started being set up (its own imports aside).
+SETUP_STARTED = time.perf_counter()
 
 
 class PageKind(StrEnum):
@@ -45,59 +59,123 @@ class PageKind(StrEnum):
 
 
 # Cloud Functions (for the Python runtime) use Flask but are not written as full-blown
-# Flask "app"s. Because of that, we can't define routing in the normal Flask way and so
-# need to drop down to this level.
+# Flask "app"s. Because of that, we can't define routing in the normal Flask way.
+#
+# The routes used to be a werkzeug `routing.Map` of these rules, tried in this order:
+#
+#     /<version>/htmlman/libref/<page>  ->  PageKind.API
+#     /<version>/htmlman/<page>         ->  PageKind.PROSE
+#
+# But matching against that is heavy work to do per request, for what is a deterministic
+# rewrite of the path. So this is a precompiled equivalent of it.
+#
+# NOTE: werkzeug matches paths with runs of slashes merged. But rather than match a path
+#       that needed merging, it responds with a redirect to the merged path (which has
+#       always been turned into a 404 here). That only happens if the request's method is
+#       allowed though: otherwise the response is a 405 as usual.
 #
 # REF: https://werkzeug.palletsprojects.com/en/3.0.x/routing/
-ROUTES = rt.Map(
-    [
-        rt.Rule(
-            "/<version>/htmlman/libref/<page>", methods=["GET"], endpoint=PageKind.API
-        ),
-        rt.Rule("/<version>/htmlman/<page>", methods=["GET"], endpoint=PageKind.PROSE),
-    ]
+RE_ROUTE = re.compile(
+    r"/(?P<version>[^/]+)/htmlman/(?:(?P<libref>libref)/)?(?P<page>[^/]+)"
 )
+ROUTE_METHODS = ["GET", "HEAD"]  # HEAD is implied by GET.
+
+UNRECOGNISED_PATH_MESSAGE = f'Unrecognised path. <a href="https://github.com/frou/ocaml-docset/blob/master/scripts/gcp/{Path(__file__).name}">See here</a> for an explanation of the purpose of this service, and open an issue if it is not working properly for you.'
+
+# Redirects precomputed when docsets are built (see ../redirect_table.py), as tables from
+# the path of each request to the URL to redirect it to. Paths that aren't in any table
+# (e.g. because the table for that OCaml version wasn't deployed) are still redirected as
+# usual.
+REDIRECT_TABLES_PATH = Path(__file__).with_name("redirects")
+
+
+def load_redirect_tables(tables_path: Path) -> dict[str, str]:
+    import json
+
+    table: dict[str, str] = {}
+    for table_path in sorted(tables_path.glob("*.json")):
+        with open(table_path) as f:
+            table.update(json.load(f))
+    return table
+
+
+REDIRECT_TABLE = load_redirect_tables(REDIRECT_TABLES_PATH)
+
+# A given version of the manual doesn't move, so browsers and CDNs can reuse redirects for
+# a long time, rather than asking the service every time a page is opened.
+# REF: https://developer.mozilla.org/en-US/docs/Web/HTTP/Reference/Headers/Cache-Control
+REDIRECT_CACHE_CONTROL = "public, max-age=2592000"  # 30 days
+
+# How many distinct redirects to remember the `Location` of. Requests are overwhelmingly
+# for a modest number of pages (those of the most-used modules), so this covers them.
+LOCATION_CACHE_SIZE = 4096
 
 
+# REF(return type): https://flask.palletsprojects.com/en/3.0.x/quickstart/#about-responses
+def transforming_redirect(request: "Request") -> "ResponseReturnValue":
+    from flask import redirect
+    from werkzeug.exceptions import MethodNotAllowed
+
+    if request.method not in ROUTE_METHODS:
+        if is_routed(request.path):
+            # REF: https://werkzeug.palletsprojects.com/en/3.0.x/routing/#:~:text=All%20of%20the%20exceptions%20raised%20are%20subclasses%20of%20HTTPException%20so%20they%20can%20be%20used%20as%20WSGI%20responses
+            return MethodNotAllowed(valid_methods=ROUTE_METHODS)
+        return UNRECOGNISED_PATH_MESSAGE, 404
+    location = redirect_location(request.path, request.query_string.decode())
+    if location is None:
+        return UNRECOGNISED_PATH_MESSAGE, 404
+    response = redirect(location)
+    response.headers["Cache-Control"] = REDIRECT_CACHE_CONTROL
+    return response
+
+
+# NOTE: functions-framework has already imported itself by the time it imports this module,
+#       so registering the function with it costs nothing then. Otherwise (e.g. when `app` is
+#       served as a plain WSGI app), it isn't imported just to do this.
 # @todo There's some static-typing issue with the decorator (`reportUnknownMemberType` Pyright error)
 # @→    https://github.com/GoogleCloudPlatform/functions-framework-python/issues/361
-@functions_framework.http
-# REF(return type): https://flask.palletsprojects.com/en/3.0.x/quickstart/#about-responses
-def transforming_redirect(request: Request) -> ResponseReturnValue:
-    try:
-        kind: PageKind
-        kind, route_vars = ROUTES.bind_to_environ(request.environ).match()
-    except MethodNotAllowed as e:
-        # REF: https://werkzeug.palletsprojects.com/en/3.0.x/routing/#:~:text=All%20of%20the%20exceptions%20raised%20are%20subclasses%20of%20HTTPException%20so%20they%20can%20be%20used%20as%20WSGI%20responses
-        return e
-    except HTTPException:
-        return (
-            f'Unrecognised path. <a href="https://github.com/frou/ocaml-docset/blob/master/scripts/gcp/{Path(__file__).name}">See here</a> for an explanation of the purpose of this service, and open an issue if it is not working properly for you.',
-            404,
-        )
+if "functions_framework" in sys.modules:
+    import functions_framework
+
+    transforming_redirect = functions_framework.http(transforming_redirect)
 
+
+RE_SLASHES = re.compile(r"/+")
+
+
+def is_routed(path: str) -> bool:
+    return RE_ROUTE.fullmatch(RE_SLASHES.sub("/", path)) is not None
+
+
+# The URL to redirect a GET request for the given path (as decoded from the request's URL)
+# and query string to, or None if the path isn't one that's redirected.
+@lru_cache(maxsize=LOCATION_CACHE_SIZE)
+def redirect_location(path: str, query_string: str) -> str | None:
+    # NOTE: Leading slashes are the exception to werkzeug's merging: they're just ignored.
+    path = "/" + path.lstrip("/")
+    if (url := REDIRECT_TABLE.get(path)) is not None:
+        # (As `urlunsplit` would add it.)
+        return f"{url}?{query_string}" if query_string else url
+    route = RE_ROUTE.fullmatch(path)
+    if route is None:
+        return None
+    kind = PageKind.API if route["libref"] else PageKind.PROSE
     match kind:
         case PageKind.API:
-            return redirect(
-                manual_url(request, route_vars["version"], "api", route_vars["page"])
-            )
+            return manual_url(query_string, route["version"], "api", route["page"])
         case PageKind.PROSE:
-            return redirect(
-                manual_url(request, route_vars["version"], route_vars["page"])
-            )
-        case k:  # pyright: ignore[reportUnnecessaryComparison]
-            log(LogSeverity.CRITICAL, slug=f"unhandled{PageKind.__name__}", kind=k)
+            return manual_url(query_string, route["version"], route["page"])
 
 
 # Build a manual URL using the modern ocaml.org URL structure.
 # REF: https://github.com/ocaml/ocaml.org/issues/534#issuecomment-2112596837
-def manual_url(req: Request, ocaml_version: str, *path_segments: str) -> str:
+def manual_url(query_string: str, ocaml_version: str, *path_segments: str) -> str:
     return urlunsplit(
         (
             "https",
             "ocaml.org",
             "/".join(["manual", ocaml_version, *path_segments]),
-            req.query_string.decode(),
+            query_string,
             # NOTE: Browsers do not send a #fragment part of a URL to the webserver when
             # making a request. However, browsers are smart about restoring a fragment
             # clientside after a redirect. REF: https://stackoverflow.com/a/2305927/82
@@ -106,6 +184,105 @@ def manual_url(req: Request, ocaml_version: str, *path_segments: str) -> str:
     )
 
 
+# ------------------------------------------------------------
+
+# The service as a plain WSGI app, without Flask (or functions-framework) in the way, so it
+# can be run behind any WSGI server, e.g. to load test it (see load_test.py). It gives the
+# same responses as `transforming_redirect`, each of which is only built once.
+#
+# NOTE: The common responses are built here just as werkzeug would build them, so that
+#       werkzeug doesn't need to be imported to serve them.
+#
+# REF: https://peps.python.org/pep-3333/
+
+# (status, headers, body)
+PreparedResponse = tuple[str, list[tuple[str, str]], bytes]
+
+HTML_CONTENT_TYPE = ("Content-Type", "text/html; charset=utf-8")
+
+# The characters that werkzeug's `iri_to_uri` leaves a URL's path and query string alone
+# if they consist only of.
+RE_URI_SAFE = re.compile(r"[A-Za-z0-9_.~%!$&'()*+,/:;=?@-]*")
+# As escaped by markupsafe (which werkzeug uses).
+HTML_ESCAPES = str.maketrans(
+    {"&": "&amp;", ">": "&gt;", "<": "&lt;", "'": "&#39;", '"': "&#34;"}
+)
+
+
+def prepare(response: "Response") -> PreparedResponse:
+    # NOTE: None of the headers that werkzeug adjusts here depend on the request.
+    headers = response.get_wsgi_headers({}).to_wsgi_list()
+    return response.status, headers, response.get_data()
+
+
+def html_response(
+    status: str, body: str, *headers: tuple[str, str]
+) -> PreparedResponse:
+    body_bytes = body.encode()
+    return (
+        status,
+        [HTML_CONTENT_TYPE, ("Content-Length", str(len(body_bytes))), *headers],
+        body_bytes,
+    )
+
+
+# REF: https://github.com/pallets/werkzeug/blob/3.1.3/src/werkzeug/utils.py#L240-L260
+@lru_cache(maxsize=LOCATION_CACHE_SIZE)
+def redirect_response(location: str) -> PreparedResponse:
+    if not RE_URI_SAFE.fullmatch(location):
+        # Leave converting the URL to ASCII to werkzeug.
+        from werkzeug.utils import redirect
+
+        response = redirect(location)
+        response.headers["Cache-Control"] = REDIRECT_CACHE_CONTROL
+        return prepare(response)
+    html_location = location.translate(HTML_ESCAPES)
+    return html_response(
+        "302 FOUND",
+        "<!doctype html>\n"
+        "<html lang=en>\n"
+        "<title>Redirecting...</title>\n"
+        "<h1>Redirecting...</h1>\n"
+        "<p>You should be redirected automatically to the target URL: "
+        f'<a href="{html_location}">{html_location}</a>. If not, click the link.\n',
+        ("Location", location),
+        ("Cache-Control", REDIRECT_CACHE_CONTROL),
+    )
+
+
+@lru_cache(maxsize=1)
+def not_found_response() -> PreparedResponse:
+    return html_response("404 NOT FOUND", UNRECOGNISED_PATH_MESSAGE)
+
+
+@lru_cache(maxsize=1)
+def method_not_allowed_response() -> PreparedResponse:
+    from werkzeug.exceptions import MethodNotAllowed
+
+    return prepare(MethodNotAllowed(valid_methods=ROUTE_METHODS).get_response())
+
+
+def app(environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+    # NOTE: WSGI passes these as the request's raw bytes decoded as latin-1.
+    path = environ.get("PATH_INFO", "").encode("latin-1").decode(errors="replace")
+    method = environ.get("REQUEST_METHOD", "GET")
+    if method not in ROUTE_METHODS:
+        if is_routed(path):
+            status, headers, body = method_not_allowed_response()
+        else:
+            status, headers, body = not_found_response()
+    elif (
+        location := redirect_location(
+            path, environ.get("QUERY_STRING", "").encode("latin-1").decode()
+        )
+    ) is None:
+        status, headers, body = not_found_response()
+    else:
+        status, headers, body = redirect_response(location)
+    start_response(status, headers)
+    return [] if method == "HEAD" else [body]
+
+
 # ------------------------------------------------------------
 
 
@@ -125,4 +302,18 @@ class LogSeverity(StrEnum):
 # REF: https://cloud.google.com/functions/docs/monitoring/logging#writing_structured_logs
 # REF: https://cloud.google.com/logging/docs/agent/logging/configuration#special-fields
 def log(severity: LogSeverity, *, slug: str, **kwargs: object) -> None:
+    import json
+
     print(json.dumps(dict(severity=severity, message=slug, **kwargs)))  # noqa: T201
+
+
+# NOTE: The process's CPU time includes starting the interpreter and importing everything
+#       that was imported before this module (e.g. functions-framework, when it runs it).
+log(
+    LogSeverity.INFO,
+    slug="startup",
+    setup_seconds=round(time.perf_counter() - SETUP_STARTED, 6),
+    process_cpu_seconds=round(time.process_time(), 6),
+    redirect_table_size=len(REDIRECT_TABLE),
+    functions_framework="functions_framework" in sys.modules,
+)
@@ -1,15 +1,49 @@
-import atexit
+import argparse
+import cProfile
+import hashlib
+import html
 import logging
+import multiprocessing
+import os
+import platform
 import re
+import shutil
 import sqlite3
-import sys
+import tarfile
+import time
+import tracemalloc
 import urllib.parse
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import nullcontext
 from enum import StrEnum, auto
+from functools import partial
+from multiprocessing.pool import AsyncResult, Pool
 from pathlib import Path
-from typing import IO, cast
+from typing import NamedTuple, TypeVar, cast
+
+import bs4
 
 # REF: https://www.crummy.com/software/BeautifulSoup/bs4/doc/
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from bs4.builder import builder_registry
+
+from index_writer import (
+    IndexRow,
+    IndexSink,
+    IndexWriter,
+    JsonLinesWriter,
+    search_tables_supported,
+)
+from indexing_report import (
+    IndexingReport,
+    Phase,
+    PhaseTimer,
+    Times,
+    mib,
+    peak_rss,
+)
+from page_cache import PageCache, code_fingerprint
 
 logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.WARNING)
 
@@ -31,6 +65,13 @@ class DashCategory(StrEnum):
 
 RE_LIBRARY_CHAPTER = re.compile(r".+The ([^ ]+) library(?:|: .+)")
 
+# The rows produced by `add_index` for the page currently being processed. Pages may be
+# processed in worker processes, so rather than touching the database here, the rows are
+# handed back (see `index_page`) to the single process that owns the database.
+page_index_rows: list[IndexRow] = []
+# Likewise, the time spent in each phase of processing the current page.
+page_phase_timer = PhaseTimer()
+
 
 def add_index(
     name: str,
@@ -39,10 +80,7 @@ def add_index(
     url_fragment: str | None = None,
 ) -> None:
     url = urllib.parse.urlunparse(("", "", str(url_path), "", "", url_fragment or ""))
-    db.execute(
-        """INSERT OR IGNORE INTO searchIndex(name, type, path) VALUES (?, ?, ?)""",
-        (name, category.title(), url),
-    )
+    page_index_rows.append((name, category.title(), url))
 
 
 STDLIB_MODULE_NAME = "Stdlib"
@@ -51,23 +89,105 @@ STDLIB_MODULE_PREFIX = STDLIB_MODULE_NAME + "."
 TEE_PREFIX = "t."
 
 
-def equivalent_unprefixed_stdlib_module_path(html_path: Path) -> Path | None:
-    if html_path.name.startswith(STDLIB_MODULE_PREFIX):
-        unprefixed_html_path = html_path.parent / html_path.name.removeprefix(
-            STDLIB_MODULE_PREFIX
+def equivalent_unprefixed_stdlib_module_path(
+    html_internal_path: Path, page_exists: Callable[[Path], bool]
+) -> Path | None:
+    if html_internal_path.name.startswith(STDLIB_MODULE_PREFIX):
+        unprefixed_html_path = (
+            html_internal_path.parent
+            / html_internal_path.name.removeprefix(STDLIB_MODULE_PREFIX)
         )
-        if unprefixed_html_path.exists():
+        if page_exists(unprefixed_html_path):
             return unprefixed_html_path
     return None
 
 
+class ParserBackend(StrEnum):
+    # The reference backend: builds a complete tree, using Python's own html.parser.
+    HTML_PARSER = "html.parser"
+    # Builds a complete tree, using the C-backed lxml (which is an optional dependency).
+    LXML = "lxml"
+    # Builds a tree of only the elements that indexing looks at (using html.parser). Such a
+    # tree can't be serialised back into the page, so it requires `RewriteMode.SPLICE`.
+    TARGETED = auto()
+
+    def default_rewrite_mode(self) -> "RewriteMode":
+        return (
+            RewriteMode.SPLICE
+            if self == ParserBackend.TARGETED
+            else RewriteMode.SERIALISE
+        )
+
+
+class RewriteMode(StrEnum):
+    # Tweaks are made to the tree, which is then serialised to become the new page.
+    SERIALISE = auto()
+    # Tweaks are recorded as offsets into the page's original markup, and spliced into it.
+    # Everything else about the page stays exactly as it was. This relies on the parser
+    # reporting source positions, which lxml does not.
+    SPLICE = auto()
+
+
+# The elements materialised by the TARGETED backend (along with their descendants).
+# NOTE: The spans with ids that `handle_module` looks at are found inside <pre> or <code>
+#       elements, which are also the parents it inserts anchors before.
+TARGETED_ELEMENTS = SoupStrainer(["h1", "h2", "h3", "pre", "code"])
+
+# An attribute within a start tag.
+# REF: https://html.spec.whatwg.org/multipage/syntax.html#attributes-2
+RE_ATTRIBUTE = re.compile(r"""\s+([^\s/>=]+)(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))?""")
+
+
 class Markup(BeautifulSoup):
     # A flag to track whether the markup has been modified (thus should be e.g. written back out to a file).
     tweaked: bool
+    # The elements that indexing looks at, gathered in a single walk of the tree.
+    h1s: list[Tag]
+    section_headers: list[Tag]  # <h2> and <h3>, in document order.
+    pres: list[Tag]
+    spans_with_id: list[Tag]
 
-    def __init__(self, markup: IO[str]):
-        super().__init__(markup, "html.parser", multi_valued_attributes=None)
+    def __init__(
+        self,
+        markup: str,
+        backend: ParserBackend = ParserBackend.HTML_PARSER,
+        rewrite_mode: RewriteMode = RewriteMode.SERIALISE,
+    ):
+        if backend == ParserBackend.TARGETED:
+            super().__init__(
+                markup,
+                "html.parser",
+                parse_only=TARGETED_ELEMENTS,
+                multi_valued_attributes=None,
+            )
+        else:
+            super().__init__(markup, str(backend), multi_valued_attributes=None)
         self.tweaked = False
+        self.original_markup = markup
+        # Tweaks to be spliced into the original markup, as (offset, length of the text to
+        # replace, replacement text). None when tweaks are made to the tree instead.
+        self.splices: list[tuple[int, int, str]] | None = (
+            [] if rewrite_mode == RewriteMode.SPLICE else None
+        )
+        self.line_offsets: list[int] | None = None
+        # How to undo each change made to the tree by a tweak, in the order they were made.
+        self.undo_log: list[Callable[[], object]] = []
+
+        self.h1s, self.section_headers, self.pres, self.spans_with_id = [], [], [], []
+        for element in self.descendants:
+            if not isinstance(element, Tag):
+                continue
+            match element.name:
+                case "h1":
+                    self.h1s.append(element)
+                case "h2" | "h3":
+                    self.section_headers.append(element)
+                case "pre":
+                    self.pres.append(element)
+                case "span" if element.get("id") is not None:
+                    self.spans_with_id.append(element)
+                case _:
+                    pass
 
     def get_attribute_string(self, element: Tag, attr_name: str) -> str | None:
         attr_val = element.get(attr_name)
@@ -78,81 +198,191 @@ class Markup(BeautifulSoup):
         #       construct `BeautifulSoup` with `multi_valued_attributes=None` above.
         return cast(str, attr_val)
 
+    # The offset of an element's start tag within the original markup.
+    def source_offset(self, element: Tag) -> int:
+        if self.line_offsets is None:
+            # NOTE: html.parser (thus `sourceline`) only counts "\n" as a line break.
+            self.line_offsets = [0] + [
+                m.end() for m in re.finditer("\n", self.original_markup)
+            ]
+        assert element.sourceline is not None and element.sourcepos is not None
+        return self.line_offsets[element.sourceline - 1] + element.sourcepos
+
+    def insert_tag_before(self, element: Tag, new_tag: Tag) -> None:
+        if self.splices is None:
+            element.insert_before(new_tag)
+            self.undo_log.append(new_tag.extract)
+        else:
+            self.splices.append((self.source_offset(element), 0, str(new_tag)))
+        self.tweaked = True
+
+    def set_attribute(self, element: Tag, attr_name: str, attr_val: str) -> None:
+        assert element.get(attr_name) is None, "only adding attributes is supported"
+        # NOTE: The tree is updated even when splicing, so that the attribute is seen by
+        #       anything that subsequently looks at the element.
+        element[attr_name] = attr_val
+        self.undo_log.append(partial(element.attrs.pop, attr_name))
+        if self.splices is not None:
+            new_tag = self.new_tag("_", attrs={attr_name: attr_val})
+            self.splices.append(
+                (
+                    self.source_offset(element) + len(f"<{element.name}"),
+                    0,
+                    str(new_tag).removeprefix("<_").removesuffix("></_>"),
+                )
+            )
+        self.tweaked = True
+
+    def delete_attribute(self, element: Tag, attr_name: str) -> None:
+        if element.get(attr_name) is None:
+            return
+        self.undo_log.append(
+            partial(element.attrs.__setitem__, attr_name, element[attr_name])
+        )
+        del element[attr_name]
+        if self.splices is not None:
+            pos = self.source_offset(element) + len(f"<{element.name}")
+            while m := RE_ATTRIBUTE.match(self.original_markup, pos):
+                if m.group(1).lower() == attr_name:
+                    self.splices.append((m.start(), m.end() - m.start(), ""))
+                    break
+                pos = m.end()
+        self.tweaked = True
+
+    # Undo all the tweaks made so far, leaving the tree as it was parsed, so that it can be
+    # indexed again.
+    def undo_tweaks(self) -> None:
+        while self.undo_log:
+            self.undo_log.pop()()
+        if self.splices is not None:
+            self.splices.clear()
+        self.tweaked = False
+
+    # The markup of the page, including any tweaks, in pieces. When splicing, the pieces
+    # are slices of the original markup interleaved with the tweaks, so they can be
+    # streamed out in a single pass without the whole new page ever being built.
+    def render_pieces(self) -> Iterator[str]:
+        if self.splices is None:
+            yield str(self)
+            return
+        pos = 0
+        # NOTE: Sorting is stable, so splices at the same offset (e.g. several anchors
+        #       before the same element) keep the order in which they were made.
+        for offset, length, text in sorted(self.splices, key=lambda s: s[0]):
+            yield self.original_markup[pos:offset]
+            yield text
+            pos = offset + length
+        yield self.original_markup[pos:]
+
+    def render(self) -> str:
+        return "".join(self.render_pieces())
+
 
-def process_page(html_path: Path, html_internal_path: Path) -> Markup:
-    with open(html_path) as f:
-        soup = Markup(f)
-    h1 = soup.find("h1")
-    if not isinstance(h1, Tag):
+# NOTE: `page_exists` says whether there is a page at a given (internal) path in the manual.
+def process_page(
+    markup: str,
+    html_internal_path: Path,
+    backend: ParserBackend,
+    rewrite_mode: RewriteMode,
+    page_exists: Callable[[Path], bool],
+) -> Markup:
+    with page_phase_timer.phase(Phase.PARSE):
+        soup = Markup(markup, backend, rewrite_mode)
+    index_tree(soup, html_internal_path, page_exists)
+    return soup
+
+
+# Index a parsed page, tweaking it as need be. This is all of `process_page` but the parsing,
+# so that a page's tree can be kept and indexed again (see watch_index.py).
+def index_tree(
+    soup: Markup, html_internal_path: Path, page_exists: Callable[[Path], bool]
+) -> None:
+    if not soup.h1s:
         if not html_internal_path.name.startswith("type_"):
             logging.info("no h1 tag in %s", html_internal_path)
-        return soup
-    h1_content = list(h1.stripped_strings)
-    libmatch = RE_LIBRARY_CHAPTER.fullmatch(" ".join(h1_content))
+        return
+    h1 = soup.h1s[0]
+    match h1_subject(list(h1.stripped_strings)):
+        case (DashCategory.LIBRARY, libname):
+            # REF: https://www.crummy.com/software/BeautifulSoup/bs4/doc/#multi-valued-attributes
+            (id_val,) = h1.get_attribute_list("id")
+            add_index(libname, DashCategory.LIBRARY, html_internal_path, id_val)
+            with page_phase_timer.phase(Phase.HANDLE_LIBRARY):
+                handle_library(html_internal_path, libname, soup)
+        case (category, module_name):
+            # Add a page ToC entry for the module's own name, because otherwise when the page
+            # is scrolled down some, it can be unclear precisely which module is being viewed.
+            insert_toc_anchor(soup, h1, category, module_name)
+            if not is_duplicate_module(module_name, html_internal_path, page_exists):
+                add_index(module_name, category, html_internal_path)
+                with page_phase_timer.phase(Phase.HANDLE_MODULE):
+                    handle_module(html_internal_path, module_name, soup)
+        case None:
+            if not html_internal_path.name.startswith("index_"):
+                logging.info(
+                    "no recognisable library or module in %s", html_internal_path
+                )
 
+
+# What a page's <h1> says that the page documents: the category and name of a module (or
+# module type) or of a library, if either.
+def h1_subject(h1_content: list[str]) -> tuple[DashCategory, str] | None:
     if h1_content[0].startswith("Module") or h1_content[0] == "Functor":
         if h1_content[0] == "Module type":
-            category = DashCategory.INTERFACE
-        else:
-            category = DashCategory.MODULE
-        module_name = h1_content[1]
-
-        # Add a page ToC entry for the module's own name, because otherwise when the page is
-        # scrolled down some, it can be unclear precisely which module is being viewed.
-        h1.insert_before(anchor_element(soup, category, module_name))
-
-        if (
-            # Skip processing the documentation for some modules, because inserting
-            # their information into the Index would cause effective duplicates.
-            #
-            # The module "Pervasives" was superseded by "Stdlib" in OCaml 4.07,
-            # deprecated in 4.08, and removed in 5.0.
-            # By skipping it, we avoid for example having both `Stdlib.at_exit` and
-            # `Pervasives.at_exit` in the Index for the same function.
-            module_name in ["Pervasives", STDLIB_MODULE_PREFIX + "Pervasives"]
-            # For most modules named `Stdlib.Foo`, the manual also contains
-            # documentation for it as module `Foo`. Skip the former because it's noisier.
-            or (
-                module_name.startswith(STDLIB_MODULE_PREFIX)
-                # It's not always that an equivalent `Foo` module exists, so check the
-                # filesystem.
-                and equivalent_unprefixed_stdlib_module_path(html_path)
+            return DashCategory.INTERFACE, h1_content[1]
+        return DashCategory.MODULE, h1_content[1]
+    libmatch = RE_LIBRARY_CHAPTER.fullmatch(" ".join(h1_content))
+    if libmatch is not None:
+        return DashCategory.LIBRARY, libmatch.group(1)
+    return None
+
+
+# Skip processing the documentation for some modules, because inserting their information
+# into the Index would cause effective duplicates.
+def is_duplicate_module(
+    module_name: str, html_internal_path: Path, page_exists: Callable[[Path], bool]
+) -> bool:
+    return (
+        # The module "Pervasives" was superseded by "Stdlib" in OCaml 4.07,
+        # deprecated in 4.08, and removed in 5.0.
+        # By skipping it, we avoid for example having both `Stdlib.at_exit` and
+        # `Pervasives.at_exit` in the Index for the same function.
+        module_name in ["Pervasives", STDLIB_MODULE_PREFIX + "Pervasives"]
+        # For most modules named `Stdlib.Foo`, the manual also contains
+        # documentation for it as module `Foo`. Skip the former because it's noisier.
+        or (
+            module_name.startswith(STDLIB_MODULE_PREFIX)
+            # It's not always that an equivalent `Foo` module exists, so check the
+            # manual.
+            and equivalent_unprefixed_stdlib_module_path(
+                html_internal_path, page_exists
             )
-            # A module named named `StdLabels.Foo` is just a re-export of a `FooLabels`
-            # module which will already be processed.
-            or module_name.startswith("StdLabels.")
-            # Skip modules with names starting with this prefix because they are billed
-            # as "for system use only".
-            or module_name.startswith("Camlinternal")
-        ):
-            return soup
-
-        add_index(module_name, category, html_internal_path)
-        handle_module(html_internal_path, module_name, soup)
-        return soup
-    elif libmatch is not None:
-        libname = libmatch.group(1)
-        # REF: https://www.crummy.com/software/BeautifulSoup/bs4/doc/#multi-valued-attributes
-        (id_val,) = h1.get_attribute_list("id")
-        add_index(libname, DashCategory.LIBRARY, html_internal_path, id_val)
-        handle_library(html_internal_path, libname, soup)
-        return soup
-    else:
-        if not html_internal_path.name.startswith("index_"):
-            logging.info("no recognisable library or module in %s", html_internal_path)
-        return soup
+            is not None
+        )
+        # A module named named `StdLabels.Foo` is just a re-export of a `FooLabels`
+        # module which will already be processed.
+        or module_name.startswith("StdLabels.")
+        # Skip modules with names starting with this prefix because they are billed
+        # as "for system use only".
+        or module_name.startswith("Camlinternal")
+    )
 
 
-# @todo Every time this function is used, its result is passed to soup's insert_before(...), so just integrate that into this function, and rename this function to mention ToC.
-def anchor_element(soup: Markup, category: DashCategory, id_: str) -> Tag:
+# An anchor that Dash uses to populate the page's ToC (its sidebar).
+def toc_anchor(soup: BeautifulSoup, category: DashCategory, id_: str) -> Tag:
     id_quoted = urllib.parse.quote(id_, safe="")
     a = soup.new_tag("a")
     a.attrs["name"] = f"//apple_ref/cpp/{category.title()}/{id_quoted}"
     a.attrs["class"] = "dashAnchor"
-    soup.tweaked = True
     return a
 
 
+def insert_toc_anchor(
+    soup: Markup, before: Tag, category: DashCategory, id_: str
+) -> None:
+    soup.insert_tag_before(before, toc_anchor(soup, category, id_))
+
+
 # REF: https://ocaml.org/releases/4.10/htmlman/lex.html#sss:lex:identifiers
 RE_IDENTIFIER_COMMON_TAIL = r"[A-Za-z0-9_']*"
 RE_IDENTIFIER = rf"[A-Za-z_]{RE_IDENTIFIER_COMMON_TAIL}"
@@ -183,17 +413,16 @@ def handle_library(html_internal_path: Path, _library_name: str, soup: Markup) -
         attr_name = "id"
         id_val = soup.get_attribute_string(element, attr_name)
         if id_val is None:
-            element[attr_name] = (id_val := autoid())
-            soup.tweaked = True
+            soup.set_attribute(element, attr_name, id_val := autoid())
         return id_val
 
-    for pre in soup.find_all("pre"):
+    for pre in soup.pres:
         pretext = " ".join(pre.stripped_strings)
         m_type = RE_LIB_DOCUMENTATION_OF_TYPE.fullmatch(pretext)
         if m_type is not None:
             typname = m_type.group(1)
             add_index(typname, DashCategory.TYPE, html_internal_path, getid(pre))
-            pre.insert_before(anchor_element(soup, DashCategory.TYPE, typname))
+            insert_toc_anchor(soup, pre, DashCategory.TYPE, typname)
 
             all_ctors = m_type.group(2)
             if all_ctors:
@@ -205,16 +434,14 @@ def handle_library(html_internal_path: Path, _library_name: str, soup: Markup) -
                         html_internal_path,
                         getid(pre),
                     )
-                    pre.insert_before(
-                        anchor_element(soup, DashCategory.CONSTRUCTOR, ctor_name)
-                    )
+                    insert_toc_anchor(soup, pre, DashCategory.CONSTRUCTOR, ctor_name)
             continue
 
         m_exn = RE_LIB_DOCUMENTATION_OF_EXCEPTION.fullmatch(pretext)
         if m_exn is not None:
             exnname = m_exn.group(1)
             add_index(exnname, DashCategory.EXCEPTION, html_internal_path, getid(pre))
-            pre.insert_before(anchor_element(soup, DashCategory.EXCEPTION, exnname))
+            insert_toc_anchor(soup, pre, DashCategory.EXCEPTION, exnname)
             continue
 
 
@@ -225,7 +452,7 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
     #       Relevent? https://github.com/ocaml/odoc/blob/c3f0f46ee2cd1fef030764e0a76d387e889fd9e7/src/html/generator.ml#L181-L202
     #       https://chatgpt.com/c/699dae05-7878-8328-8546-6f9babb1c16a
     #       https://developer.mozilla.org/en-US/docs/Web/CSS/Reference/Selectors/:heading
-    for section_header in soup.find_all(["h2", "h3"]):
+    for section_header in soup.section_headers:
         if section_header.name == "h2":
             major_section = section_header.string
             assert major_section is not None
@@ -236,9 +463,7 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
                 html_internal_path,
                 soup.get_attribute_string(section_header, "id"),
             )
-            section_header.insert_before(
-                anchor_element(soup, DashCategory.SECTION, major_section)
-            )
+            insert_toc_anchor(soup, section_header, DashCategory.SECTION, major_section)
         elif section_header.name == "h3":
             minor_section = section_header.string
             assert minor_section is not None
@@ -260,13 +485,14 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
                 html_internal_path,
                 soup.get_attribute_string(section_header, "id"),
             )
-            section_header.insert_before(
-                anchor_element(
-                    soup, DashCategory.SECTION, f"{toc_indent}{minor_section}"
-                )
+            insert_toc_anchor(
+                soup,
+                section_header,
+                DashCategory.SECTION,
+                f"{toc_indent}{minor_section}",
             )
 
-    for span in soup.find_all("span", id=True):
+    for span in soup.spans_with_id:
         spanid = soup.get_attribute_string(span, "id")
         assert spanid is not None
 
@@ -301,19 +527,18 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
             else:
                 add_index(f"{module_name}.{name}", category, html_internal_path, spanid)
 
-            span_parent.insert_before(
-                anchor_element(
-                    soup,
-                    category,
-                    # In the sidebar (ToC), display constructor names from a module's
-                    # primary type (`type t` by convention) in a cleaner way.
-                    name[len(TEE_PREFIX) :] if name.startswith(TEE_PREFIX) else name,
-                )
+            insert_toc_anchor(
+                soup,
+                span_parent,
+                category,
+                # In the sidebar (ToC), display constructor names from a module's
+                # primary type (`type t` by convention) in a cleaner way.
+                name[len(TEE_PREFIX) :] if name.startswith(TEE_PREFIX) else name,
             )
 
         elif spanid.startswith("TYPE"):
             name = spanid[4:]
-            span_parent.insert_before(anchor_element(soup, DashCategory.TYPE, name))
+            insert_toc_anchor(soup, span_parent, DashCategory.TYPE, name)
             add_index(
                 f"{module_name}.{name}", DashCategory.TYPE, html_internal_path, spanid
             )
@@ -325,9 +550,7 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
                 html_internal_path,
                 spanid,
             )
-            span_parent.insert_before(
-                anchor_element(soup, DashCategory.EXCEPTION, name)
-            )
+            insert_toc_anchor(soup, span_parent, DashCategory.EXCEPTION, name)
         elif spanid.startswith("VAL"):
             name = spanid[3:]
             if any("->" in s for s in span_parent.strings):  # pyright: ignore[reportAny]
@@ -339,7 +562,7 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
             #       https://ocaml.org/manual/5.5/bindingops.html
             #       `let+` and `and+` don't have it, but many various stdlib operators have `(...)`
             add_index(f"{module_name}.{name}", category, html_internal_path, spanid)
-            span_parent.insert_before(anchor_element(soup, category, name))
+            insert_toc_anchor(soup, span_parent, category, name)
         # On the Stdlib module's page, nullify the links to its submodules at the
         # bottom, which point to e.g. "Stdlib.Foo.html". Right next to them remain
         # clickable links to distinct pages that document those modules in unprefixed
@@ -352,42 +575,708 @@ def handle_module(html_internal_path: Path, module_name: str, soup: Markup) -> N
         # @body Also, rename the section from "Standard library modules" to "Submodules of Stdlib", since the list doesn't include the Stdlib module itself?
         # @body The section is also mentioned in the blurb at the very top of the page.
         elif module_name == STDLIB_MODULE_NAME and spanid.startswith("MODULE"):
-            if a := span.find("a"):
-                try:
-                    del a["href"]
-                except KeyError:
-                    pass
+            if isinstance(a := span.find("a"), Tag):
+                soup.delete_attribute(a, "href")
 
 
 # ------------------------------------------------------------
 
-docset_documents_path, docset_indexdb_path = (Path(arg) for arg in sys.argv[1:])
 
-docset_indexdb_path.unlink(missing_ok=True)
-db = sqlite3.connect(docset_indexdb_path)
-atexit.register(db.close)
-atexit.register(db.commit)
-db.execute(
-    "CREATE TABLE searchIndex(id INTEGER PRIMARY KEY, name TEXT, type TEXT, path TEXT)"
-)
-db.execute("CREATE UNIQUE INDEX anchor ON searchIndex (name, type, path)")
-
-for page_path in [
-    path
-    for path in Path(docset_documents_path).rglob("*.html")
-    # "This library is part of the internal OCaml compiler API, and is not the language standard library."
-    if not path.match("**/compilerlibref/*")
-]:
-    page_markup = process_page(page_path, page_path.relative_to(docset_documents_path))
-    if page_markup.tweaked:
-        with open(page_path, "w") as f:
-            f.write(str(page_markup))
-
-logging.getLogger().setLevel(logging.INFO)
-logging.info(
-    "%d entities were indexed (spanning %d categories)",
-    *db.execute("SELECT COUNT(*), COUNT(DISTINCT type) from searchIndex").fetchone(),  # pyright: ignore[reportAny]
-)
+PAGE_ENCODING = "utf-8"
+
+
+# "This library is part of the internal OCaml compiler API, and is not the language standard library."
+def is_indexed_page(internal_path: Path) -> bool:
+    return internal_path.suffix == ".html" and not internal_path.match(
+        "**/compilerlibref/*"
+    )
+
+
+def page_exists_in(documents_path: Path, html_internal_path: Path) -> bool:
+    return (documents_path / html_internal_path).exists()
+
+
+# What the pre-scan makes of a page from its path alone (see `classify_page`), before
+# anything has been read from it.
+class PageKind(StrEnum):
+    # A page whose contents are indexed, so it needs to be parsed in full.
+    CONTENT = auto()
+    # A page that is not expected to have anything to index: the signature pages
+    # (type_*.html) that have no <h1>, and the manual's own indexes (index_*.html).
+    UNINDEXED = auto()
+    # The page of a module whose contents are skipped (see `is_duplicate_module`), so only
+    # an anchor for the module's own name needs to be inserted into it.
+    DUPLICATE_MODULE = auto()
+
+
+# NOTE: ocamldoc names the page of each module after the module.
+def classify_page(
+    html_internal_path: Path, page_exists: Callable[[Path], bool]
+) -> PageKind:
+    if html_internal_path.name.startswith(("type_", "index_")):
+        return PageKind.UNINDEXED
+    if is_duplicate_module(html_internal_path.stem, html_internal_path, page_exists):
+        return PageKind.DUPLICATE_MODULE
+    return PageKind.CONTENT
+
+
+class H1Sniff(NamedTuple):
+    # The offset of the page's first <h1> start tag, or None if the page has no <h1>.
+    offset: int | None
+    # The <h1>'s `stripped_strings`.
+    strings: list[str]
+
+
+RE_H1 = re.compile(r"<h1[\s>].*?</h1\s*>", re.IGNORECASE | re.DOTALL)
+RE_TAG = re.compile(r"<[^>]*>")
+# Markup in which "<h1" might not be a tag, or tags might not be what they seem.
+RE_UNSNIFFABLE = re.compile(r"<!--|<!\[CDATA\[|<script|<style|<textarea", re.IGNORECASE)
+
+
+# Find a page's first <h1> and its text, without parsing the page. Returns None if that
+# can't be done with certainty, in which case the page must be parsed to find out.
+def sniff_h1(markup: str) -> H1Sniff | None:
+    m = RE_H1.search(markup)
+    end = len(markup) if m is None else m.end()
+    if RE_UNSNIFFABLE.search(markup, 0, end):
+        return None
+    if m is None:
+        return H1Sniff(None, [])
+    inner = m.group()[m.group().index(">") + 1 : m.group().rindex("<")]
+    if RE_H1.match(inner) or "<h1" in inner.lower():
+        return None
+    return H1Sniff(
+        m.start(),
+        [
+            string
+            for text in RE_TAG.split(inner)
+            if (string := html.unescape(text).strip())
+        ],
+    )
+
+
+# The markup that indexing a page would leave it with (and it would index no rows), if the
+# pre-scan can tell that without parsing the page. Otherwise None. A page that would be
+# left untweaked is returned as the very same `markup` object.
+def prescanned_markup(
+    kind: PageKind,
+    markup: str,
+    html_internal_path: Path,
+    rewrite_mode: RewriteMode,
+    page_exists: Callable[[Path], bool],
+) -> str | None:
+    if kind == PageKind.CONTENT or (sniff := sniff_h1(markup)) is None:
+        return None
+    if sniff.offset is None:
+        return markup
+    try:
+        subject = h1_subject(sniff.strings)
+    except IndexError:
+        return None
+    if subject is None:
+        return markup
+    category, name = subject
+    # NOTE: When serialising, the tree is needed to write the anchor out.
+    if (
+        category == DashCategory.LIBRARY
+        or not is_duplicate_module(name, html_internal_path, page_exists)
+        or rewrite_mode != RewriteMode.SPLICE
+    ):
+        return None
+    anchor = toc_anchor(BeautifulSoup("", "html.parser"), category, name)
+    return markup[: sniff.offset] + str(anchor) + markup[sniff.offset :]
+
+
+# The pages of the manual whose existence processing a page depends on (only ever the
+# unprefixed equivalent of a `Stdlib.Foo` module's page), of those that exist.
+def existing_neighbours(
+    html_internal_path: Path, page_exists: Callable[[Path], bool]
+) -> frozenset[Path]:
+    unprefixed_html_path = equivalent_unprefixed_stdlib_module_path(
+        html_internal_path, page_exists
+    )
+    return frozenset(() if unprefixed_html_path is None else [unprefixed_html_path])
+
+
+class PageInput(NamedTuple):
+    internal_path: Path
+    # The page's markup, or None if it is to be read from the Documents directory (as
+    # opposed to having been read from the manual's archive and not yet written there).
+    markup: str | None
+    kind: PageKind = PageKind.CONTENT
+    # The pages that processing this page asks about the existence of (see
+    # `existing_neighbours`) and that exist. Pages may be processed in worker processes, and
+    # the whole manifest would otherwise be sent along with every one of them.
+    neighbours: frozenset[Path] = frozenset()
+
+
+# Read the manual's archive in a single pass, copying everything in it straight into the
+# Documents directory, except for the pages to be indexed, which are returned instead so
+# that each of them can be written there just once, after being processed. The paths of
+# everything in the archive are also returned.
+def unpack_manual_archive(
+    archive_path: Path, container_name: str, documents_path: Path
+) -> tuple[list[PageInput], set[Path]]:
+    pages: list[PageInput] = []
+    internal_paths: set[Path] = set()
+    # NOTE: The archive is read as a stream ("r|gz"), since seeking within gzip data is
+    #       slow, and nothing needs to be read more than once.
+    with tarfile.open(archive_path, "r|gz") as archive:
+        for member in archive:
+            internal_path = Path(os.path.normpath(member.name))
+            # Only the manual's container directory is wanted in the docset, and nothing
+            # may be written outside of the Documents directory.
+            if (
+                not member.isfile()
+                or internal_path.is_absolute()
+                or internal_path.parts[0] != container_name
+                or ".." in internal_path.parts
+            ):
+                continue
+            internal_paths.add(internal_path)
+            member_file = archive.extractfile(member)
+            assert member_file is not None
+            if is_indexed_page(internal_path):
+                pages.append(
+                    PageInput(internal_path, member_file.read().decode(PAGE_ENCODING))
+                )
+                continue
+            output_path = documents_path / internal_path
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_path, "wb") as f:
+                shutil.copyfileobj(member_file, f)
+    return pages, internal_paths
+
+
+class PageResult(NamedTuple):
+    rows: list[IndexRow]
+    # The rewritten page, if it was tweaked and the caller asked to have it returned.
+    html: str | None
+    phase_times: dict[Phase, Times]
+    # Whether the pre-scan let the page bypass the parser.
+    prescanned: bool = False
+    # The most memory allocated at once while processing the page, if that was traced.
+    peak_memory: int | None = None
+    # The peak RSS of the process that processed the page, as of when it was done.
+    peak_rss: int = 0
+
+
+# Process a page, and write it out to the Documents directory if it was tweaked (or if it
+# isn't there yet).
+def index_page(
+    page: PageInput,
+    documents_path: Path,
+    backend: ParserBackend,
+    rewrite_mode: RewriteMode,
+    return_html: bool,
+    profile_dir: Path | None,
+    trace_memory: bool = False,
+) -> PageResult:
+    page_path = documents_path / page.internal_path
+    page_exists = page.neighbours.__contains__
+    baseline_memory = 0
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline_memory, _ = tracemalloc.get_traced_memory()
+    with cProfile.Profile() if profile_dir else nullcontext() as profiler:
+        markup = page.markup
+        if markup is None:
+            # NOTE: Line endings are left untranslated (`newline=""`) so that pages are
+            #       written back out with exactly the same ones.
+            with (
+                page_phase_timer.phase(Phase.READ),
+                open(page_path, encoding=PAGE_ENCODING, newline="") as f,
+            ):
+                markup = f.read()
+        with page_phase_timer.phase(Phase.PRESCAN):
+            prescanned = prescanned_markup(
+                page.kind, markup, page.internal_path, rewrite_mode, page_exists
+            )
+        html = None
+        pieces = None
+        if prescanned is not None:
+            if prescanned is not markup:
+                html = prescanned if return_html else None
+                pieces = [prescanned]
+            elif page.markup is not None:
+                pieces = [page.markup]
+        else:
+            page_markup = process_page(
+                markup, page.internal_path, backend, rewrite_mode, page_exists
+            )
+            if page_markup.tweaked:
+                with page_phase_timer.phase(Phase.SERIALISE):
+                    if return_html:
+                        html = page_markup.render()
+                        pieces = [html]
+                    else:
+                        pieces = list(page_markup.render_pieces())
+            elif page.markup is not None:
+                pieces = [page.markup]
+            # NOTE: A tree is riddled with reference cycles (between parents and children),
+            #       so it would only be freed whenever the cyclic garbage collector next got
+            #       round to it, by which time several more trees may have piled up. Its
+            #       rows and rewrites have been extracted, so it's released right away.
+            with page_phase_timer.phase(Phase.RELEASE):
+                page_markup.decompose()
+            del page_markup
+        if pieces is not None:
+            with (
+                page_phase_timer.phase(Phase.WRITE),
+                open(page_path, "w", encoding=PAGE_ENCODING, newline="") as f,
+            ):
+                f.writelines(pieces)
+    if profile_dir and profiler:
+        profiler.dump_stats(profile_dir / profile_filename(page.internal_path))
+    rows = page_index_rows.copy()
+    page_index_rows.clear()
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1] - baseline_memory
+    return PageResult(
+        rows,
+        html,
+        page_phase_timer.take(),
+        prescanned is not None,
+        peak_memory,
+        peak_rss(),
+    )
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# Like `Pool.imap` (with a chunksize of 1), except that at most `limit` items are in flight
+# at once, i.e. submitted to the pool but with their results not yet consumed. (`imap`
+# submits everything at once, so if results are consumed more slowly than they are
+# produced, they pile up.)
+def imap_bounded(
+    pool: Pool, func: Callable[[T], R], items: Iterable[T], limit: int
+) -> Iterator[R]:
+    pending: deque[AsyncResult[R]] = deque()
+    for item in items:
+        if len(pending) >= limit:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (item,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def profile_filename(page_internal_path: Path) -> str:
+    return "__".join(page_internal_path.parts) + ".prof"
+
+
+def page_cache_key(
+    cache: PageCache,
+    page: PageInput,
+    documents_path: Path,
+) -> str:
+    return cache.key(
+        page.internal_path,
+        cache.file_digest(documents_path / page.internal_path)
+        if page.markup is None
+        else hashlib.sha256(page.markup.encode(PAGE_ENCODING)).digest(),
+        # `process_page` consults the rest of the manual about these, so they're part of the key.
+        *sorted(str(path) for path in page.neighbours),
+    )
+
+
+class IndexingOptions(NamedTuple):
+    jobs: int = os.cpu_count() or 1
+    parser_backend: ParserBackend = ParserBackend.HTML_PARSER
+    rewrite_mode: RewriteMode = RewriteMode.SERIALISE
+    report_path: Path | None = None
+    slowest_n: int = 10
+    profile_dir: Path | None = None
+    archive_path: Path | None = None
+    archive_container: str = "htmlman"
+    search_tables: bool = False
+    max_in_flight: int | None = None
+    trace_memory: bool = False
+    jsonl_path: Path | None = None
+
+
+# Add the command-line arguments that determine `IndexingOptions`.
+def add_indexing_arguments(arg_parser: argparse.ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=IndexingOptions._field_defaults["jobs"],
+        help="number of worker processes to index pages with (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--cache",
+        type=Path,
+        help="path of a database in which to keep the results of indexing each page, so that unchanged pages are not processed again by subsequent runs",
+    )
+    arg_parser.add_argument(
+        "--parser",
+        type=ParserBackend,
+        choices=list(ParserBackend),
+        default=IndexingOptions._field_defaults["parser_backend"],
+        help="how to parse pages (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--rewrite",
+        type=RewriteMode,
+        choices=list(RewriteMode),
+        help=f"how to write tweaks back out to pages (default: {RewriteMode.SPLICE} for the {ParserBackend.TARGETED} parser, otherwise {RewriteMode.SERIALISE})",
+    )
+    arg_parser.add_argument(
+        "--report",
+        type=Path,
+        help="path of a JSON file to write a report to, detailing the time spent in each phase of processing, the number of entities indexed in each category, and the slowest pages",
+    )
+    arg_parser.add_argument(
+        "--slowest",
+        type=int,
+        default=IndexingOptions._field_defaults["slowest_n"],
+        help="number of the slowest pages (and, when tracing memory, of the pages that took the most memory) to detail in the report (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        help="directory to write cProfile data to for each of the slowest pages (note that profiling slows down processing)",
+    )
+    arg_parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        help="maximum number of pages to have in flight at once (being processed, or processed but with their results not yet written), to bound memory use (default: unbounded)",
+    )
+    arg_parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="trace how much memory processing each page takes, with tracemalloc, and report the pages that took the most (note that tracing slows down processing)",
+    )
+    arg_parser.add_argument(
+        "--jsonl",
+        type=Path,
+        help="path of a file to also write the index to as JSON lines, i.e. an object with the name, type and path of each entry per line (e.g. for a web-based viewer)",
+    )
+    arg_parser.add_argument(
+        "--search-tables",
+        action="store_true",
+        help="also add tables to the index for fast case-insensitive, prefix and substring lookups, alongside the table that Dash uses (see query_index.py)",
+    )
+    arg_parser.add_argument(
+        "--archive-container",
+        default=IndexingOptions._field_defaults["archive_container"],
+        help="name of the directory in the manual's archive that contains the manual; only it is copied to the Documents directory (default: %(default)s)",
+    )
+
+
+def indexing_options(
+    arg_parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> IndexingOptions:
+    parser_backend: ParserBackend = args.parser
+    rewrite_mode: RewriteMode = args.rewrite or parser_backend.default_rewrite_mode()
+    if parser_backend == ParserBackend.LXML and builder_registry.lookup("lxml") is None:
+        arg_parser.error("the lxml parser backend requires lxml to be installed")
+    if (parser_backend, rewrite_mode) in [
+        (ParserBackend.LXML, RewriteMode.SPLICE),
+        (ParserBackend.TARGETED, RewriteMode.SERIALISE),
+    ]:
+        arg_parser.error(
+            f"the {parser_backend} parser backend does not support {rewrite_mode} rewrites"
+        )
+    if args.max_in_flight is not None and args.max_in_flight < 1:
+        arg_parser.error("--max-in-flight must be at least 1")
+    if args.search_tables and not search_tables_supported():
+        arg_parser.error(
+            f"--search-tables requires SQLite with FTS5 and its trigram tokenizer (3.34+), but this is SQLite {sqlite3.sqlite_version}"
+        )
+    return IndexingOptions(
+        jobs=args.jobs,
+        parser_backend=parser_backend,
+        rewrite_mode=rewrite_mode,
+        report_path=args.report,
+        slowest_n=args.slowest,
+        profile_dir=args.profile_dir,
+        archive_container=args.archive_container,
+        search_tables=args.search_tables,
+        max_in_flight=args.max_in_flight,
+        trace_memory=args.trace_memory,
+        jsonl_path=args.jsonl,
+    )
+
+
+# NOTE: What a page is indexed as also depends on the version of the parser that parses it:
+#       html.parser is part of Python's standard library, and lxml is a separate package.
+def open_page_cache(path: Path | str, options: IndexingOptions) -> PageCache:
+    parser_versions = [platform.python_version(), bs4.__version__]
+    if options.parser_backend == ParserBackend.LXML:
+        # NOTE: Imported here, since lxml is only required for this backend.
+        import lxml.etree
+
+        parser_versions.append(".".join(map(str, lxml.etree.LXML_VERSION)))
+    return PageCache(
+        path,
+        code_fingerprint(
+            [Path(__file__)],
+            *parser_versions,
+            options.parser_backend,
+            options.rewrite_mode,
+        ),
+    )
+
+
+# Index the manual in the docset's Documents directory (or read it from `options.archive_path`
+# into there), writing the index database to `indexdb_path`.
+#
+# NOTE: Passing the same `cache` when indexing several docsets means that pages which are
+#       identical between them are only processed once. Likewise, passing a `pool` means
+#       its worker processes are reused rather than started afresh.
+def index_docset(
+    documents_path: Path,
+    indexdb_path: Path,
+    options: IndexingOptions,
+    cache: PageCache | None = None,
+    pool: Pool | None = None,
+) -> None:
+    index_writer = IndexWriter(indexdb_path, options.search_tables)
+    # Everything that the index is written to, each timed separately.
+    sinks: list[IndexSink] = [index_writer]
+    if options.jsonl_path is not None:
+        sinks.append(JsonLinesWriter(options.jsonl_path))
+    sink_seconds = dict.fromkeys((sink.name for sink in sinks), 0.0)
+    report = IndexingReport()
+    if options.profile_dir is not None:
+        options.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    # The manifest of the manual: the paths of everything in it, from a single listing.
+    manifest: set[Path]
+    if options.archive_path is None:
+        manifest = {
+            path.relative_to(documents_path)
+            for path in documents_path.rglob("*")
+            if not path.is_dir()
+        }
+        pages = [
+            PageInput(internal_path, None)
+            for internal_path in manifest
+            if is_indexed_page(internal_path)
+        ]
+    else:
+        pages, manifest = unpack_manual_archive(
+            options.archive_path, options.archive_container, documents_path
+        )
+    page_exists = frozenset(manifest).__contains__
+    # Pre-scan the pages, so that those which can be handled without being parsed are.
+    pages = [
+        page._replace(
+            kind=classify_page(page.internal_path, page_exists),
+            neighbours=existing_neighbours(page.internal_path, page_exists),
+        )
+        for page in pages
+    ]
+    # NOTE: The pages are sorted so that rows are always inserted in the same order (and so
+    #       get the same ids), regardless of directory listing order or the number of jobs.
+    pages.sort(key=lambda page: page.internal_path)
+
+    # The cache key of each page (if caching), and the cached result for it (if any).
+    cache_hits_before, cache_misses_before = (
+        (cache.hits, cache.misses) if cache else (0, 0)
+    )
+    page_cache_keys = [
+        page_cache_key(cache, page, documents_path) if cache else None for page in pages
+    ]
+    cached_results = [
+        cache.get(key) if cache and key else None for key in page_cache_keys
+    ]
+
+    index_page_in = partial(
+        index_page,
+        documents_path=documents_path,
+        backend=options.parser_backend,
+        rewrite_mode=options.rewrite_mode,
+        return_html=cache is not None,
+        profile_dir=options.profile_dir,
+        trace_memory=options.trace_memory,
+    )
+    uncached_pages = [
+        page for page, cached in zip(pages, cached_results) if cached is None
+    ]
+
+    def insert_all(uncached_results: Iterator[PageResult]) -> None:
+        for page, key, cached in zip(pages, page_cache_keys, cached_results):
+            if cached is None:
+                result = next(uncached_results)
+                if cache and key:
+                    cache.put(key, result.rows, result.html)
+            else:
+                result = PageResult(*cached, phase_times={})
+                # A page read from the archive needs to be written even if it's untweaked.
+                if (html := result.html or page.markup) is not None:
+                    with (
+                        page_phase_timer.phase(Phase.WRITE),
+                        open(
+                            documents_path / page.internal_path,
+                            "w",
+                            encoding=PAGE_ENCODING,
+                            newline="",
+                        ) as f,
+                    ):
+                        f.write(html)
+            with page_phase_timer.phase(Phase.INSERT):
+                for sink in sinks:
+                    started = time.perf_counter()
+                    sink.add(result.rows)
+                    sink_seconds[sink.name] += time.perf_counter() - started
+            report.add(
+                str(page.internal_path),
+                len(result.rows),
+                result.phase_times | page_phase_timer.take(),
+                result.prescanned,
+                result.peak_memory,
+            )
+            nonlocal workers_peak_rss
+            workers_peak_rss = max(workers_peak_rss, result.peak_rss)
+
+    # The peak RSS of whichever processes processed pages.
+    workers_peak_rss = 0
+
+    def map_pages(pool: Pool) -> Iterator[PageResult]:
+        if options.max_in_flight is not None:
+            return imap_bounded(
+                pool, index_page_in, uncached_pages, options.max_in_flight
+            )
+        # NOTE: `imap` yields results in the order of its input, so the rows are inserted
+        #       in the same order as in a serial run. A chunksize of 1 keeps the workers
+        #       busy even though page sizes (thus costs) vary widely.
+        return pool.imap(index_page_in, uncached_pages, chunksize=1)
+
+    if pool is not None:
+        insert_all(map_pages(pool))
+    elif options.jobs > 1 and len(uncached_pages) > 1:
+        with multiprocessing.Pool(options.jobs) as own_pool:
+            insert_all(map_pages(own_pool))
+    else:
+        insert_all(map(index_page_in, uncached_pages))
+
+    # NOTE: Until now, only warnings were logged, so that details about individual pages
+    #       don't drown out this summary.
+    logging.getLogger().setLevel(logging.INFO)
+    if options.archive_path is not None:
+        logging.info(
+            "%d pages were read from %s, and %d other files were copied from it",
+            len(pages),
+            options.archive_path,
+            len(manifest) - len(pages),
+        )
+    for sink in sinks:
+        started = time.perf_counter()
+        sink.finish()
+        sink_seconds[sink.name] += time.perf_counter() - started
+    logging.info(
+        "time spent per sink: %s",
+        ", ".join(f"{name} {seconds:.2f}s" for name, seconds in sink_seconds.items()),
+    )
+    logging.info(
+        "time spent per phase: %s",
+        ", ".join(
+            f"{phase} {wall:.2f}s (CPU {cpu:.2f}s)"
+            for phase, (wall, cpu) in report.phase_totals().items()
+        ),
+    )
+    logging.info(
+        "%d of the %d pages that were processed bypassed the parser after the pre-scan",
+        report.parses_avoided(),
+        len(uncached_pages),
+    )
+    if slowest := report.slowest(1):
+        logging.info(
+            "the slowest page was %s (%.2fs)", slowest[0].page, slowest[0].total()[0]
+        )
+    main_peak_rss = peak_rss()
+    logging.info(
+        "peak RSS was %s in the main process, and %s in the processes that processed pages",
+        mib(main_peak_rss),
+        mib(workers_peak_rss),
+    )
+    if largest := report.largest(options.slowest_n):
+        logging.info(
+            "the pages that took the most memory were %s",
+            ", ".join(
+                f"{page.page} ({mib(page.peak_memory or 0)})" for page in largest
+            ),
+        )
+    profile_paths: dict[str, Path] = {}
+    if options.profile_dir is not None:
+        # Only the profiles of the slowest pages are kept.
+        profile_paths = {
+            page.page: options.profile_dir / profile_filename(Path(page.page))
+            for page in report.slowest(options.slowest_n)
+        }
+        for path in options.profile_dir.glob("*.prof"):
+            if path not in profile_paths.values():
+                path.unlink()
+    if options.report_path is not None:
+        report.write(
+            options.report_path,
+            slowest_n=options.slowest_n,
+            category_counts=dict(
+                index_writer.db.execute(
+                    "SELECT type, COUNT(*) FROM searchIndex GROUP BY type ORDER BY type"
+                ).fetchall()
+            ),
+            profile_paths={
+                page: path for page, path in profile_paths.items() if path.exists()
+            },
+            peak_rss={"main": main_peak_rss, "workers": workers_peak_rss},
+            sink_seconds=sink_seconds,
+        )
+    if cache is not None:
+        hits, misses = (
+            cache.hits - cache_hits_before,
+            cache.misses - cache_misses_before,
+        )
+        logging.info(
+            "%d pages were replayed from the cache and %d were processed (%.1f%% hit ratio)",
+            hits,
+            misses,
+            100 * hits / (hits + misses) if hits + misses else 0.0,
+        )
+    logging.info(
+        "%d entities were indexed (spanning %d categories)",
+        *index_writer.db.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT type) from searchIndex"
+        ).fetchone(),  # pyright: ignore[reportAny]
+    )
+    for sink in sinks:
+        sink.close()
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("docset_documents_path", type=Path)
+    arg_parser.add_argument("docset_indexdb_path", type=Path)
+    add_indexing_arguments(arg_parser)
+    arg_parser.add_argument(
+        "--from-archive",
+        type=Path,
+        help="path of the manual's .tar.gz archive to read the manual from, rather than from a copy already in the Documents directory (everything is then written to the Documents directory by this script)",
+    )
+    args = arg_parser.parse_args()
+    options = indexing_options(arg_parser, args)._replace(
+        archive_path=args.from_archive
+    )
+
+    cache = None
+    if args.cache is not None:
+        cache = open_page_cache(args.cache, options)
+    index_docset(args.docset_documents_path, args.docset_indexdb_path, options, cache)
+    if cache is not None:
+        cache.close()
+
 
 # TODO: Apply an edit to htmlman/libref/style.css to use `font-family: ui-monospace, monospace;` for `code`.
 #       https://chatgpt.com/c/699e20a1-7980-8329-a683-12e11975a4e9
+
+
+if __name__ == "__main__":
+    main()
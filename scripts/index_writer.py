@@ -0,0 +1,175 @@
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Protocol
+
+# A row of the searchIndex table: (name, type, path)
+IndexRow = tuple[str, str, str]
+
+
+# Something that the index is written to (in some format), as each page's rows of it are
+# produced. Since the rows are only produced once, by a single pass over the manual, writing
+# the index in several formats doesn't mean parsing the manual several times.
+class IndexSink(Protocol):
+    # A short name for the sink, for reports.
+    name: str
+
+    def add(self, rows: Iterable[IndexRow]) -> None: ...
+
+    # Complete the output, once all rows have been added.
+    def finish(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+# Whether this SQLite can create the search tables (see `IndexWriter.create_search_tables`),
+# which need FTS5 and its trigram tokenizer (SQLite 3.34+). Otherwise, the index would only
+# fail to be created once the whole manual had been indexed.
+def search_tables_supported() -> bool:
+    db = sqlite3.connect(":memory:")
+    try:
+        db.execute("CREATE VIRTUAL TABLE t USING fts5(name, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+    return True
+
+
+# Writes the docset's index database (docSet.dsidx) in one bulk load.
+#
+# REF: https://kapeli.com/docsets#createsqlite
+class IndexWriter:
+    name = "dash"
+    # How many rows to buffer before handing them to SQLite.
+    BATCH_SIZE = 4096
+
+    def __init__(self, path: Path, search_tables: bool = False):
+        path.unlink(missing_ok=True)
+        self.search_tables = search_tables
+        self.db = sqlite3.connect(path)
+        # The database is built from scratch each time, so there is nothing to protect if
+        # the build is interrupted midway: forgo the rollback journal and fsyncs.
+        # REF: https://www.sqlite.org/pragma.html
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("PRAGMA locking_mode = EXCLUSIVE")
+        self.db.execute("PRAGMA temp_store = MEMORY")
+        # NOTE: The UNIQUE index that Dash expects is only created in `finish`, because
+        #       building it in one go is cheaper than maintaining it row by row.
+        self.db.execute(
+            "CREATE TABLE searchIndex(id INTEGER PRIMARY KEY, name TEXT, type TEXT, path TEXT)"
+        )
+        # The unique index will not be present to make duplicate inserts no-ops (as `INSERT
+        # OR IGNORE` would), so duplicates are instead dropped here, before they reach
+        # SQLite. Keeping the first occurrence means rows get the same ids as they would.
+        self.seen: set[IndexRow] = set()
+        self.buffer: list[IndexRow] = []
+        self.rows_written = 0
+        self.seconds_spent = 0.0
+
+    def add(self, rows: Iterable[IndexRow]) -> None:
+        for row in rows:
+            if row not in self.seen:
+                self.seen.add(row)
+                self.buffer.append(row)
+        if len(self.buffer) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        started = time.perf_counter()
+        self.db.executemany(
+            "INSERT INTO searchIndex(name, type, path) VALUES (?, ?, ?)", self.buffer
+        )
+        self.rows_written += len(self.buffer)
+        self.buffer.clear()
+        self.seconds_spent += time.perf_counter() - started
+
+    # Complete the database so that it's ready to be shipped in the docset.
+    def finish(self) -> None:
+        self.flush()
+        started = time.perf_counter()
+        self.db.execute("CREATE UNIQUE INDEX anchor ON searchIndex (name, type, path)")
+        if self.search_tables:
+            self.create_search_tables()
+        self.db.commit()
+        self.db.execute("ANALYZE")
+        self.db.commit()
+        # Compact the file, since it's distributed as part of the docset.
+        self.db.execute("VACUUM")
+        self.seconds_spent += time.perf_counter() - started
+        logging.info(
+            "%d rows were written to the index in %.3fs (%.0f rows/s)",
+            self.rows_written,
+            self.seconds_spent,
+            self.rows_written / self.seconds_spent if self.seconds_spent else 0.0,
+        )
+
+    # Add tables that make lookups by other than exact name fast, alongside (but without
+    # altering) the searchIndex table that Dash uses. They are keyed by searchIndex's ids.
+    #
+    # - searchIndexName holds each name lowercased, the way that SQLite's LIKE and NOCASE
+    #   compare them (i.e. ASCII only), and is indexed, for case-insensitive exact and
+    #   prefix lookups.
+    # - searchIndexTrigram is a full-text index of the names, tokenised into trigrams, for
+    #   substring lookups. It's an "external content" table, so it doesn't hold
+    #   another copy of the names.
+    #
+    # See query_index.py for how these are queried.
+    # REF: https://www.sqlite.org/fts5.html#the_experimental_trigram_tokenizer
+    # REF: https://www.sqlite.org/fts5.html#external_content_tables
+    def create_search_tables(self) -> None:
+        self.db.execute(
+            "CREATE TABLE searchIndexName(id INTEGER PRIMARY KEY, name_lower TEXT)"
+        )
+        self.db.execute(
+            "INSERT INTO searchIndexName SELECT id, lower(name) FROM searchIndex"
+        )
+        self.db.execute("CREATE INDEX name_lower ON searchIndexName (name_lower)")
+        self.db.execute(
+            "CREATE VIRTUAL TABLE searchIndexTrigram USING fts5(name, content='searchIndex', content_rowid='id', tokenize='trigram')"
+        )
+        self.db.execute(
+            "INSERT INTO searchIndexTrigram(searchIndexTrigram) VALUES ('rebuild')"
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# Writes the index as JSON lines: an object with the name, type and path of each entry, in
+# the order they'd have in the index database (e.g. for the search of a web-based viewer).
+#
+# REF: https://jsonlines.org/
+class JsonLinesWriter:
+    name = "jsonl"
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")  # noqa: SIM115
+        # Duplicates are dropped, as they are from the index database.
+        self.seen: set[IndexRow] = set()
+        self.rows_written = 0
+
+    def add(self, rows: Iterable[IndexRow]) -> None:
+        for row in rows:
+            if row not in self.seen:
+                self.seen.add(row)
+                name, type_, path = row
+                self.file.write(
+                    json.dumps(
+                        {"name": name, "type": type_, "path": path}, ensure_ascii=False
+                    )
+                    + "\n"
+                )
+                self.rows_written += 1
+
+    def finish(self) -> None:
+        self.file.flush()
+        logging.info("%d rows were written to %s", self.rows_written, self.path)
+
+    def close(self) -> None:
+        self.file.close()
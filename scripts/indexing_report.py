@@ -0,0 +1,168 @@
+import json
+import resource
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import StrEnum, auto
+from pathlib import Path
+from typing import NamedTuple
+
+
+class Phase(StrEnum):
+    READ = auto()
+    PRESCAN = auto()
+    PARSE = auto()
+    HANDLE_MODULE = auto()
+    HANDLE_LIBRARY = auto()
+    SERIALISE = auto()
+    RELEASE = auto()
+    WRITE = auto()
+    INSERT = auto()
+
+
+# (wall-clock seconds, CPU seconds)
+Times = tuple[float, float]
+
+
+# Accumulates the time spent in each phase of processing a page.
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.times: dict[Phase, Times] = {}
+
+    @contextmanager
+    def phase(self, phase: Phase) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            prev_wall, prev_cpu = self.times.get(phase, (0.0, 0.0))
+            self.times[phase] = (
+                prev_wall + time.perf_counter() - wall,
+                prev_cpu + time.process_time() - cpu,
+            )
+
+    # Hand over the times accumulated so far, and start afresh.
+    def take(self) -> dict[Phase, Times]:
+        times, self.times = self.times, {}
+        return times
+
+
+# The peak resident set size of the current process so far, in bytes.
+def peak_rss() -> int:
+    # NOTE: macOS reports it in bytes, Linux in KiB.
+    # REF: https://docs.python.org/3/library/resource.html#resource.getrusage
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def mib(n_bytes: int) -> str:
+    return f"{n_bytes / 2**20:.1f}MiB"
+
+
+class PageReport(NamedTuple):
+    page: str
+    rows: int
+    phase_times: dict[Phase, Times]
+    # Whether the pre-scan let the page bypass the parser.
+    prescanned: bool
+    # The most memory (in bytes) that was allocated at once while processing the page, if
+    # that was traced.
+    peak_memory: int | None
+
+    def total(self) -> Times:
+        return (
+            sum(wall for wall, _ in self.phase_times.values()),
+            sum(cpu for _, cpu in self.phase_times.values()),
+        )
+
+
+def times_json(times: Times) -> dict[str, float]:
+    wall, cpu = times
+    return {"wall_s": round(wall, 6), "cpu_s": round(cpu, 6)}
+
+
+# A machine-readable account of where an indexing run spent its time.
+class IndexingReport:
+    def __init__(self) -> None:
+        self.pages: list[PageReport] = []
+
+    def add(
+        self,
+        page: str,
+        rows: int,
+        phase_times: dict[Phase, Times],
+        prescanned: bool = False,
+        peak_memory: int | None = None,
+    ) -> None:
+        self.pages.append(PageReport(page, rows, phase_times, prescanned, peak_memory))
+
+    def parses_avoided(self) -> int:
+        return sum(page.prescanned for page in self.pages)
+
+    def slowest(self, n: int) -> list[PageReport]:
+        return sorted(self.pages, key=lambda p: p.total()[0], reverse=True)[:n]
+
+    def largest(self, n: int) -> list[PageReport]:
+        return sorted(
+            (page for page in self.pages if page.peak_memory is not None),
+            key=lambda p: p.peak_memory or 0,
+            reverse=True,
+        )[:n]
+
+    def phase_totals(self) -> dict[Phase, Times]:
+        totals: dict[Phase, Times] = {}
+        for page in self.pages:
+            for phase, (wall, cpu) in page.phase_times.items():
+                prev_wall, prev_cpu = totals.get(phase, (0.0, 0.0))
+                totals[phase] = (prev_wall + wall, prev_cpu + cpu)
+        # In the order that phases happen in.
+        return {phase: totals[phase] for phase in Phase if phase in totals}
+
+    def write(
+        self,
+        path: Path,
+        *,
+        slowest_n: int,
+        category_counts: dict[str, int],
+        profile_paths: dict[str, Path],
+        peak_rss: dict[str, int],
+        sink_seconds: dict[str, float],
+    ) -> None:
+        slowest_pages = [
+            {
+                "page": page.page,
+                "rows": page.rows,
+                **times_json(page.total()),
+                "phases": {
+                    phase: times_json(times)
+                    for phase, times in page.phase_times.items()
+                },
+            }
+            | (
+                {"profile": str(profile_paths[page.page])}
+                if page.page in profile_paths
+                else {}
+            )
+            for page in self.slowest(slowest_n)
+        ]
+        report = {
+            "pages": len(self.pages),
+            "parses_avoided": self.parses_avoided(),
+            "phases": {
+                phase: times_json(times) for phase, times in self.phase_totals().items()
+            },
+            "sinks": {
+                name: round(seconds, 6) for name, seconds in sink_seconds.items()
+            },
+            "categories": category_counts,
+            "slowest_pages": slowest_pages,
+            "peak_rss_bytes": peak_rss,
+            "largest_pages": [
+                {"page": page.page, "peak_memory_bytes": page.peak_memory}
+                for page in self.largest(slowest_n)
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+
+class CachedPage(NamedTuple):
+    # searchIndex rows: (name, type, path)
+    rows: list[tuple[str, str, str]]
+    # The rewritten page, or None if indexing it did not tweak it.
+    html: str | None
+
+
+# Identify a version of the indexing code. Cache entries made by a different version are
+# never used, because the rows or rewritten HTML it produces might differ.
+def code_fingerprint(source_paths: Iterable[Path], *extra: str) -> str:
+    h = hashlib.sha256()
+    for path in source_paths:
+        h.update(path.read_bytes())
+    for s in extra:
+        h.update(s.encode())
+    return h.hexdigest()
+
+
+# A persistent store of the results of indexing individual pages, so that unchanged pages
+# don't need to be parsed again when the docset is rebuilt.
+class PageCache:
+    # NOTE: `path` may be ":memory:" for a cache that only lasts as long as this object.
+    def __init__(self, path: Path | str, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS page(key TEXT PRIMARY KEY, fingerprint TEXT, rows TEXT, html TEXT)"
+        )
+        # Entries made by other versions of the indexing code can never be hit again.
+        self.db.execute("DELETE FROM page WHERE fingerprint != ?", (fingerprint,))
+        # The digests of the contents of files, as of their modification times and sizes.
+        # NOTE: These don't depend on the indexing code, so they're kept regardless.
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS file_digest(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest BLOB)"
+        )
+
+    # NOTE: The result of indexing a page depends not only on its content, but also on its
+    #       path (which ends up in the rows) and on any facts about its surroundings that
+    #       the indexing code looks at, so the caller passes the latter as `context`.
+    def key(self, internal_path: Path, content_digest: bytes, *context: str) -> str:
+        h = hashlib.sha256(self.fingerprint.encode())
+        for s in [str(internal_path), *context]:
+            h.update(s.encode())
+            h.update(b"\0")
+        h.update(content_digest)
+        return h.hexdigest()
+
+    # The digest of a file's contents. A file that has the same modification time and size
+    # as when it was last digested isn't read again, so that the pages of an unchanged
+    # manual (e.g. one extracted afresh, which keeps the modification times from its
+    # archive) are only ever read by whichever process indexes them.
+    def file_digest(self, path: Path) -> bytes:
+        stat = path.stat()
+        resolved_path = str(path.resolve())
+        found: tuple[bytes] | None = self.db.execute(
+            "SELECT digest FROM file_digest WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (resolved_path, stat.st_mtime_ns, stat.st_size),
+        ).fetchone()
+        if found is not None:
+            return found[0]
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").digest()
+        self.db.execute(
+            "INSERT OR REPLACE INTO file_digest(path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+            (resolved_path, stat.st_mtime_ns, stat.st_size, digest),
+        )
+        return digest
+
+    def get(self, key: str) -> CachedPage | None:
+        found: tuple[str, str | None] | None = self.db.execute(
+            "SELECT rows, html FROM page WHERE key = ?", (key,)
+        ).fetchone()
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rows_json, html = found
+        return CachedPage([tuple(row) for row in json.loads(rows_json)], html)  # pyright: ignore[reportAny]
+
+    def put(self, key: str, rows: list[tuple[str, str, str]], html: str | None) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO page(key, fingerprint, rows, html) VALUES (?, ?, ?, ?)",
+            (key, self.fingerprint, json.dumps(rows), html),
+        )
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
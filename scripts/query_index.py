@@ -0,0 +1,211 @@
+# Look entries up in a docset's index database (docSet.dsidx), by name prefix, substring or
+# (case-insensitively) qualified name, as editor tooling would. Lookups can be made against
+# the plain schema that Dash uses (the searchIndex table alone), or against the tables that
+# `index_manual.py --search-tables` adds to accelerate them (see `IndexWriter`).
+#
+# With --benchmark, the latency of each kind of lookup is measured against both schemas,
+# using terms sampled from the database itself, and their results are checked to match.
+
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+from enum import StrEnum, auto
+from pathlib import Path
+
+from index_writer import IndexRow
+
+
+class LookupKind(StrEnum):
+    PREFIX = auto()
+    SUBSTRING = auto()
+    # An exact name, ignoring case. A leading "Stdlib." is optional, since most such
+    # modules are only indexed by their unprefixed names.
+    QUALIFIED = auto()
+
+
+class Schema(StrEnum):
+    PLAIN = auto()
+    ACCELERATED = auto()
+
+
+SELECT = "SELECT s.name, s.type, s.path FROM searchIndex s"
+# Entries are looked up in order of their case-folded names, as for completion. With the
+# index on name_lower, that's the order in which they're found (so a lookup can stop as
+# soon as it has enough of them); otherwise, they all need to be found and sorted first.
+ORDER = "ORDER BY lower(s.name), s.id LIMIT :limit"
+ORDER_BY_NAME_LOWER = "ORDER BY n.name_lower, n.id LIMIT :limit"
+# NOTE: LIKE, NOCASE and lower() all fold the case of ASCII letters only, and the
+#       accelerated lookups are written to match exactly what the plain ones do.
+# REF: https://www.sqlite.org/lang_expr.html#like
+LOOKUPS: dict[tuple[LookupKind, Schema], str] = {
+    (LookupKind.PREFIX, Schema.PLAIN): f"""
+        {SELECT} WHERE s.name LIKE :term_like || '%' ESCAPE '\\' {ORDER}
+    """,
+    # The names that start with the term are those in this range (U+10FFFF being the
+    # greatest character), which the index on name_lower can find directly.
+    (LookupKind.PREFIX, Schema.ACCELERATED): f"""
+        {SELECT} JOIN searchIndexName n ON n.id = s.id
+        WHERE n.name_lower >= lower(:term) AND n.name_lower < lower(:term) || char(1114111)
+        {ORDER_BY_NAME_LOWER}
+    """,
+    (LookupKind.SUBSTRING, Schema.PLAIN): f"""
+        {SELECT} WHERE s.name LIKE '%' || :term_like || '%' ESCAPE '\\' {ORDER}
+    """,
+    # The trigram tokenizer folds case more widely than LIKE does, so its matches are
+    # narrowed down to LIKE's.
+    (LookupKind.SUBSTRING, Schema.ACCELERATED): f"""
+        {SELECT} JOIN searchIndexTrigram t ON t.rowid = s.id
+        WHERE searchIndexTrigram MATCH :term_phrase AND instr(lower(s.name), lower(:term))
+        {ORDER}
+    """,
+    # NOTE: Not `s.name = :term COLLATE NOCASE OR ...`, which SQLite 3.40 wrongly answers
+    #       using the (case-sensitive) anchor index.
+    (LookupKind.QUALIFIED, Schema.PLAIN): f"""
+        {SELECT} WHERE s.name COLLATE NOCASE IN (:term, :term_unprefixed)
+        {ORDER}
+    """,
+    (LookupKind.QUALIFIED, Schema.ACCELERATED): f"""
+        {SELECT} JOIN searchIndexName n ON n.id = s.id
+        WHERE n.name_lower IN (lower(:term), lower(:term_unprefixed))
+        {ORDER_BY_NAME_LOWER}
+    """,
+}
+
+STDLIB_MODULE_PREFIX = "stdlib."
+# A trigram index can't find anything shorter than this.
+TRIGRAM_LENGTH = 3
+
+
+def lookup(
+    db: sqlite3.Connection, kind: LookupKind, schema: Schema, term: str, limit: int
+) -> list[IndexRow]:
+    if (
+        kind == LookupKind.SUBSTRING
+        and schema == Schema.ACCELERATED
+        and len(term) < TRIGRAM_LENGTH
+    ):
+        schema = Schema.PLAIN
+    params = {
+        "term": term,
+        "term_like": term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"),
+        # REF: https://www.sqlite.org/fts5.html#fts5_strings
+        "term_phrase": '"' + term.replace('"', '""') + '"',
+        "term_unprefixed": term[len(STDLIB_MODULE_PREFIX) :]
+        if term.lower().startswith(STDLIB_MODULE_PREFIX)
+        else term,
+        "limit": limit,
+    }
+    return db.execute(LOOKUPS[kind, schema], params).fetchall()
+
+
+def has_search_tables(db: sqlite3.Connection) -> bool:
+    return (
+        db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN ('searchIndexName', 'searchIndexTrigram')"
+        ).fetchone()[0]
+        == 2
+    )
+
+
+# Terms of each kind to look up, sampled from the names in the database.
+def sample_terms(
+    db: sqlite3.Connection, count: int, seed: int
+) -> dict[LookupKind, list[str]]:
+    rng = random.Random(seed)
+    names: list[str] = [
+        name for (name,) in db.execute("SELECT name FROM searchIndex ORDER BY id")
+    ]
+    sample = [rng.choice(names) for _ in range(count)]
+    terms: dict[LookupKind, list[str]] = {kind: [] for kind in LookupKind}
+    for name in sample:
+        terms[LookupKind.PREFIX].append(name[: rng.randint(1, min(len(name), 8))])
+        start = rng.randrange(len(name))
+        terms[LookupKind.SUBSTRING].append(
+            name[start : start + rng.randint(TRIGRAM_LENGTH, 10)]
+        )
+        qualified = name if rng.random() < 0.5 else "Stdlib." + name
+        terms[LookupKind.QUALIFIED].append(
+            qualified.lower() if rng.random() < 0.5 else qualified
+        )
+    return terms
+
+
+def benchmark(db: sqlite3.Connection, count: int, seed: int, limit: int) -> None:
+    for kind, terms in sample_terms(db, count, seed).items():
+        latencies: dict[Schema, list[float]] = {schema: [] for schema in Schema}
+        mismatches = 0
+        for term in terms:
+            results: dict[Schema, list[IndexRow]] = {}
+            for schema in Schema:
+                started = time.perf_counter()
+                results[schema] = lookup(db, kind, schema, term, limit)
+                latencies[schema].append(time.perf_counter() - started)
+            mismatches += results[Schema.PLAIN] != results[Schema.ACCELERATED]
+        for schema in Schema:
+            runs = sorted(latencies[schema])
+            print(
+                f"{kind:9} {schema:11} p50 {statistics.median(runs) * 1e3:8.3f}ms  "
+                f"p99 {runs[min(int(len(runs) * 0.99), len(runs) - 1)] * 1e3:8.3f}ms"
+            )
+        if mismatches:
+            print(f"{kind}: {mismatches} of {len(terms)} lookups had different results")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("docset_indexdb_path", type=Path)
+    arg_parser.add_argument("term", nargs="?")
+    arg_parser.add_argument(
+        "--kind",
+        type=LookupKind,
+        choices=list(LookupKind),
+        default=LookupKind.PREFIX,
+        help="kind of lookup (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--schema",
+        type=Schema,
+        choices=list(Schema),
+        help=f"which tables to look up with (default: {Schema.ACCELERATED} if the database has them, otherwise {Schema.PLAIN})",
+    )
+    arg_parser.add_argument(
+        "--limit",
+        type=int,
+        default=50,
+        help="maximum number of entries to look up (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="N",
+        help="instead of looking up a term, benchmark N lookups of each kind against each schema",
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_intermixed_args()
+    if args.term is None and args.benchmark is None:
+        arg_parser.error("either a term or --benchmark is required")
+
+    # NOTE: Opened read-only, since lookups shouldn't ever modify a docset.
+    db = sqlite3.connect(
+        f"{args.docset_indexdb_path.resolve().as_uri()}?mode=ro", uri=True
+    )
+    accelerated = has_search_tables(db)
+    if (
+        args.benchmark is not None or args.schema == Schema.ACCELERATED
+    ) and not accelerated:
+        arg_parser.error(
+            f"{args.docset_indexdb_path} has no search tables (see index_manual.py --search-tables)"
+        )
+    if args.benchmark is not None:
+        benchmark(db, args.benchmark, args.seed, args.limit)
+        return
+
+    schema = args.schema or (Schema.ACCELERATED if accelerated else Schema.PLAIN)
+    for name, type_, path in lookup(db, args.kind, schema, args.term, args.limit):
+        print(f"{name}\t{type_}\t{path}")
+
+
+if __name__ == "__main__":
+    main()
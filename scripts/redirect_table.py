@@ -0,0 +1,90 @@
+# Precompute the redirects that the redirect service (see ./gcp/main.py) makes for a docset,
+# i.e. for each page of the manual that the docset's `DashDocSetFallbackURL` can point at,
+# the URL of the same page on ocaml.org.
+#
+# The table is written as JSON, mapping the path of each request the service can receive
+# (e.g. "/5.2/htmlman/libref/Arg.html") to the URL to redirect it to. The service loads such
+# tables so that it doesn't need to work out those redirects itself. The tables can also be
+# exported as a static `_redirects` file, which hosts like Netlify and Cloudflare Pages
+# serve without needing to run the service at all.
+#
+# REF: https://docs.netlify.com/routing/redirects/
+# REF: https://developers.cloudflare.com/pages/configuration/redirects/
+
+import argparse
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+# NOTE: This must be kept in step with how ./gcp/main.py transforms paths.
+# REF: https://github.com/ocaml/ocaml.org/issues/534#issuecomment-2112596837
+MANUAL_CONTAINER_BASENAME = "htmlman"
+API_DIRECTORY_NAME = "libref"
+
+
+# The ocaml.org URL for a page of the manual, given its path within the manual, or None if
+# the redirect service doesn't redirect requests for it.
+def manual_url(ocaml_version: str, internal_path: Path) -> str | None:
+    match internal_path.parts:
+        case (container, directory, page) if (
+            container == MANUAL_CONTAINER_BASENAME and directory == API_DIRECTORY_NAME
+        ):
+            return f"https://ocaml.org/manual/{ocaml_version}/api/{page}"
+        case (container, page) if container == MANUAL_CONTAINER_BASENAME:
+            return f"https://ocaml.org/manual/{ocaml_version}/{page}"
+        case _:
+            return None
+
+
+def redirect_table(
+    ocaml_version: str, internal_paths: Iterable[Path]
+) -> dict[str, str]:
+    return {
+        f"/{ocaml_version}/{path.as_posix()}": url
+        for path in sorted(internal_paths)
+        if path.suffix == ".html" and (url := manual_url(ocaml_version, path))
+    }
+
+
+def write_redirect_table(
+    ocaml_version: str, documents_path: Path, output_path: Path
+) -> dict[str, str]:
+    table = redirect_table(
+        ocaml_version,
+        (path.relative_to(documents_path) for path in documents_path.rglob("*.html")),
+    )
+    with open(output_path, "w") as f:
+        json.dump(table, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return table
+
+
+# REF: https://docs.netlify.com/routing/redirects/#syntax-for-the-redirects-file
+def write_static_redirects(tables: Iterable[dict[str, str]], output_path: Path) -> None:
+    with open(output_path, "w") as f:
+        for table in tables:
+            f.writelines(f"{path} {url} 302\n" for path, url in table.items())
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("ocaml_version")
+    arg_parser.add_argument("docset_documents_path", type=Path)
+    arg_parser.add_argument(
+        "output_path", type=Path, help="path of the JSON redirect table to write"
+    )
+    arg_parser.add_argument(
+        "--static-redirects",
+        type=Path,
+        help="path of a static _redirects file to also export the table as",
+    )
+    args = arg_parser.parse_args()
+    table = write_redirect_table(
+        args.ocaml_version, args.docset_documents_path, args.output_path
+    )
+    if args.static_redirects is not None:
+        write_static_redirects([table], args.static_redirects)
+
+
+if __name__ == "__main__":
+    main()
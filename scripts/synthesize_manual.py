@@ -0,0 +1,214 @@
+# Generate a synthetic HTML manual, shaped like the one that ocaml.org distributes as
+# ocaml-*-refman-html.tar.gz, so that the indexer can be exercised (e.g. benchmarked)
+# without downloading a real one. The markup mimics what ocamldoc generates for the
+# `htmlman/libref` pages, but only to the extent that the indexer cares about.
+
+import argparse
+import html
+import random
+from pathlib import Path
+
+MANUAL_CONTAINER_BASENAME = "htmlman"
+
+
+def page(title: str, body: list[str]) -> str:
+    return "\n".join(
+        [
+            "<!DOCTYPE html>",
+            "<html>",
+            "<head>",
+            '<link rel="stylesheet" href="style.css" type="text/css">',
+            '<meta content="text/html; charset=utf8" http-equiv="Content-Type">',
+            f"<title>{html.escape(title)}</title>",
+            "</head>",
+            "<body>",
+            '<div class="navbar">&nbsp;<a class="up" href="index.html" title="Index">Up</a></div>',
+            *body,
+            "</body>",
+            "</html>",
+            "",
+        ]
+    )
+
+
+def info(text: str) -> str:
+    return (
+        f'<div class="info ">\n<div class="info-desc">\n<p>{text}</p>\n</div>\n</div>'
+    )
+
+
+def module_page(rng: random.Random, module_name: str, kind: str, scale: int) -> str:
+    body = [
+        f'<h1>{kind} <a href="type_{module_name}.html">{module_name}</a></h1>',
+        f'<pre><span id="MODULE{module_name}"><span class="keyword">module</span> {module_name}</span>: <code class="code"><span class="keyword">sig</span></code> <a href="{module_name}.html">..</a> <code class="code"><span class="keyword">end</span></code></pre>',
+        info(f"Operations provided by {module_name}."),
+        '<hr width="100%">',
+    ]
+    for section in range(scale):
+        body.append(f'<h2 id="1_Section{section}">Section {section}</h2>')
+        for subsection in range(rng.randint(0, 2)):
+            body.append(
+                f'<h3 id="2_Section{section}_{subsection}">Subsection {section}.{subsection}</h3>'
+            )
+        body += type_declaration(rng, "t" if section == 0 else f"t{section}")
+        for v in range(rng.randint(3, 12)):
+            name = f"f{section}_{v}"
+            typ = "'a t -&gt; int" if rng.random() < 0.7 else "int"
+            body += [
+                f'<pre><span id="VAL{name}"><span class="keyword">val</span> {name}</span> : <code class="type">{typ}</code></pre>',
+                info(f'Documentation for <code class="code">{name}</code>.'),
+            ]
+        if rng.random() < 0.3:
+            name = f"Error{section}"
+            body.append(
+                f'<pre><span id="EXCEPTION{name}"><span class="keyword">exception</span> {name}</span> <span class="keyword">of</span> <code class="type">string</code></pre>'
+            )
+    return page(module_name, body)
+
+
+def type_declaration(rng: random.Random, type_name: str) -> list[str]:
+    lines = [
+        f'<pre><code><span id="TYPE{type_name}"><span class="keyword">type</span> <code class="type">\'a</code> {type_name}</span> = </code></pre><table class="typetable">'
+    ]
+    if rng.random() < 0.5:
+        # A variant type.
+        for c in range(rng.randint(1, 6)):
+            ctor = f"C{c}"
+            lines += [
+                "<tr>",
+                '<td align="left" valign="top" ><code><span class="keyword">|</span></code></td>',
+                f'<td align="left" valign="top" ><code><span id="TYPEELT{type_name}.{ctor}"><span class="constructor">{ctor}</span></span></code></td>',
+                "</tr>",
+            ]
+    else:
+        # A record type.
+        for f in range(rng.randint(1, 6)):
+            field = f"field{f}"
+            lines += [
+                "<tr>",
+                f'<td align="left" valign="top" ><code>&nbsp;&nbsp;<span id="TYPEELT{type_name}.{field}">{field}</span>&nbsp;: <code class="type">int</code>;</code></td>',
+                "</tr>",
+            ]
+    lines.append("</table>")
+    return lines
+
+
+def library_chapter_page(rng: random.Random, chapter: int, library_name: str) -> str:
+    body = [
+        f'<h1 class="chapter" id="sec{chapter}"><span>Chapter {chapter}</span> The {library_name} library: synthetic</h1>',
+        "<p>This library is synthetic.</p>",
+    ]
+    for i in range(rng.randint(5, 20)):
+        match rng.randrange(3):
+            case 0:
+                body.append(f"<pre>type {library_name}_{i}</pre>")
+            case 1:
+                body.append(f"<pre>type {library_name}_{i} = A{i} | B{i} of int</pre>")
+            case _:
+                body.append(
+                    f"<pre>exception {library_name.title()}_error{i} of string</pre>"
+                )
+        body.append(f"<p>Prose about item {i}.</p>")
+    return page(f"The {library_name} library", body)
+
+
+def stdlib_page(module_names: list[str]) -> str:
+    body = ['<h1>Module <a href="type_Stdlib.html">Stdlib</a></h1>']
+    body += [
+        f'<pre><span id="VALraise{i}"><span class="keyword">val</span> raise{i}</span> : <code class="type">exn -&gt; \'a</code></pre>'
+        for i in range(50)
+    ]
+    # NOTE: ocamldoc writes operators' names into ids as they are, without escaping them.
+    body += [
+        f'<pre><span id="VAL({op})"><span class="keyword">val</span> ( {html.escape(op)} )</span> : <code class="type">bool -&gt; bool -&gt; bool</code></pre>'
+        for op in ["&&", "||", "<", ">", "<>"]
+    ]
+    body.append('<h2 id="modules">Standard library modules</h2>')
+    body += [
+        f'<pre><span id="MODULE{name}"><span class="keyword">module</span> <a href="Stdlib.{name}.html">{name}</a></span>: <code class="type"><a href="{name}.html">{name}</a></code></pre>'
+        for name in module_names
+    ]
+    return page("Stdlib", body)
+
+
+def synthesize(output_path: Path, module_count: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    container_path = output_path / MANUAL_CONTAINER_BASENAME
+    libref_path = container_path / "libref"
+    libref_path.mkdir(parents=True, exist_ok=True)
+
+    def write(path: Path, text: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    module_names = [f"Synth{i:04d}" for i in range(module_count)]
+    for i, name in enumerate(module_names):
+        # Most pages are modest in size, but a few are much larger, as in the real manual.
+        scale = rng.choice([1, 2, 3, 4, 20]) if i % 10 else 8
+        kind = (
+            "Module type" if i % 17 == 5 else ("Functor" if i % 13 == 7 else "Module")
+        )
+        write(libref_path / f"{name}.html", module_page(rng, name, kind, scale))
+        # Pages with signatures only; these have no <h1>.
+        write(
+            libref_path / f"type_{name}.html",
+            page(
+                name,
+                [
+                    f'<code class="code"><span class="keyword">sig</span> ... {name}</code>'
+                ],
+            ),
+        )
+        # Most modules are also documented as duplicates under the Stdlib prefix.
+        if i % 4:
+            write(
+                libref_path / f"Stdlib.{name}.html",
+                module_page(rng, f"Stdlib.{name}", "Module", scale),
+            )
+    write(libref_path / "Stdlib.html", stdlib_page(module_names))
+    # Modules that are deliberately not indexed.
+    for name in ["CamlinternalSynth", "StdLabels.Synth", "Pervasives"]:
+        write(libref_path / f"{name}.html", module_page(rng, name, "Module", 1))
+    for index_name in ["index_values", "index_types", "index_modules"]:
+        write(libref_path / f"{index_name}.html", page(index_name, ["<h1>Index</h1>"]))
+    # Pages which are excluded from indexing altogether.
+    write(
+        container_path / "compilerlibref" / "Synth.html",
+        module_page(rng, "Synth", "Module", 1),
+    )
+
+    for chapter, library_name in enumerate(
+        ["str", "unix", "threads", "dynlink", "runtime_events"], start=30
+    ):
+        write(
+            container_path / f"lib{library_name}.html",
+            library_chapter_page(rng, chapter, library_name),
+        )
+    write(
+        container_path / "index.html",
+        page("The OCaml system", ["<h1>The OCaml system</h1>"]),
+    )
+    write(
+        libref_path / "style.css",
+        "a:visited {color : #416DFF; text-decoration : none; }\n",
+    )
+    write(container_path / "manual.css", "body { margin: 0 }\n")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("output_path", type=Path)
+    arg_parser.add_argument(
+        "-n",
+        "--modules",
+        type=int,
+        default=200,
+        help="number of modules to generate (default: %(default)s)",
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    synthesize(args.output_path, args.modules, args.seed)
+
+
+if __name__ == "__main__":
+    main()
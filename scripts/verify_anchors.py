@@ -0,0 +1,211 @@
+# Verify that a built docset's index and its pages agree:
+#
+# - every entry in the index (searchIndex) points at a page that exists, and at an id in it
+#   that exists, if its path has a fragment (e.g. a TYPE/VAL span's id, an `autoid_` id
+#   given by `handle_library`, or a section header's id);
+# - every entry has a ToC anchor (see `toc_anchor` in index_manual.py) of its type on its
+#   page, except for the entries of libraries, which don't get one.
+#
+# Pages aren't parsed in full to find their ids and anchors: each is scanned for the
+# attributes of its tags, on several cores. The ids found are then joined with the index by
+# SQLite. The exit status is 1 if anything dangles.
+
+import argparse
+import html
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.WARNING)
+
+PAGE_ENCODING = "utf-8"
+# Comments are matched too, only so that any tags in them are skipped.
+RE_TAG = re.compile(
+    r"""<!--.*?-->|<([A-Za-z][^\s/>]*)((?:\s+[^\s/>=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))?)*)\s*/?>""",
+    re.DOTALL,
+)
+RE_ATTRIBUTE = re.compile(
+    r"""([^\s/>=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?"""
+)
+RE_TOC_ANCHOR_NAME = re.compile(r"//apple_ref/cpp/([^/]+)/.+")
+# See `DashCategory`. Libraries get no ToC anchor, since they're whole pages.
+UNANCHORED_TYPES = {"Library"}
+# How many problems to detail.
+DETAILED_PROBLEMS = 20
+
+
+class PageAnchors(NamedTuple):
+    page: str
+    ids: set[str]
+    # The number of ToC anchors on the page of each type.
+    toc_anchors: Counter[str]
+
+
+def scan_page(documents_path: Path, page: str) -> PageAnchors | None:
+    try:
+        markup = (documents_path / page).read_text(encoding=PAGE_ENCODING)
+    except FileNotFoundError:
+        return None
+    ids: set[str] = set()
+    toc_anchors: Counter[str] = Counter()
+    for tag in RE_TAG.finditer(markup):
+        if tag[1] is None or not tag[2]:
+            continue
+        # NOTE: Values are compared as a browser (or BeautifulSoup, for the index) reads
+        #       them, i.e. with character references decoded: when pages are serialised,
+        #       e.g. the id "VAL(&&)" is written out as "VAL(&amp;&amp;)".
+        attrs = {
+            m[1].lower(): html.unescape(
+                m[2] if m[2] is not None else m[3] or m[4] or ""
+            )
+            for m in RE_ATTRIBUTE.finditer(tag[2])
+        }
+        if (id_ := attrs.get("id")) is not None:
+            ids.add(id_)
+        if (
+            tag[1].lower() == "a"
+            and "dashAnchor" in attrs.get("class", "").split()
+            and (m := RE_TOC_ANCHOR_NAME.fullmatch(attrs.get("name", "")))
+        ):
+            toc_anchors[m[1]] += 1
+    return PageAnchors(page, ids, toc_anchors)
+
+
+class Problems(NamedTuple):
+    missing_pages: list[tuple[str, str, str]]
+    dangling_fragments: list[tuple[str, str, str]]
+    # (page, type, number of entries, number of ToC anchors)
+    missing_toc_anchors: list[tuple[str, str, int, int]]
+
+    def count(self) -> int:
+        return (
+            len(self.missing_pages)
+            + len(self.dangling_fragments)
+            + len(self.missing_toc_anchors)
+        )
+
+
+def verify_anchors(documents_path: Path, indexdb_path: Path, jobs: int) -> Problems:
+    db = sqlite3.connect(":memory:", uri=True)
+    db.execute("ATTACH ? AS docset", (f"{indexdb_path.resolve().as_uri()}?mode=ro",))
+    db.executescript(
+        """
+        CREATE TEMP TABLE entry AS
+            SELECT name, type, path,
+                substr(path, 1, instr(path || '#', '#') - 1) AS page,
+                substr(path, instr(path || '#', '#') + 1) AS fragment
+            FROM docset.searchIndex;
+        CREATE TEMP TABLE page (page TEXT PRIMARY KEY);
+        CREATE TEMP TABLE page_id (page TEXT, id TEXT, PRIMARY KEY (page, id)) WITHOUT ROWID;
+        CREATE TEMP TABLE page_toc_anchors (page TEXT, type TEXT, count INTEGER);
+        """
+    )
+    pages = [
+        page for (page,) in db.execute("SELECT DISTINCT page FROM entry ORDER BY page")
+    ]
+
+    def insert_scans(scans: Iterator[PageAnchors | None]) -> None:
+        for anchors in scans:
+            if anchors is None:
+                continue
+            db.execute("INSERT INTO page VALUES (?)", (anchors.page,))
+            db.executemany(
+                "INSERT INTO page_id VALUES (?, ?)",
+                ((anchors.page, id_) for id_ in anchors.ids),
+            )
+            db.executemany(
+                "INSERT INTO page_toc_anchors VALUES (?, ?, ?)",
+                ((anchors.page, type_, n) for type_, n in anchors.toc_anchors.items()),
+            )
+
+    scan = partial(scan_page, documents_path)
+    if jobs > 1 and len(pages) > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            insert_scans(pool.imap_unordered(scan, pages, chunksize=8))
+    else:
+        insert_scans(map(scan, pages))
+
+    return Problems(
+        missing_pages=db.execute(
+            "SELECT name, type, path FROM entry WHERE page NOT IN (SELECT page FROM page) ORDER BY path"
+        ).fetchall(),
+        dangling_fragments=db.execute(
+            """
+            SELECT name, type, path FROM entry
+            WHERE fragment != '' AND page IN (SELECT page FROM page)
+                AND NOT EXISTS (SELECT 1 FROM page_id WHERE page_id.page = entry.page AND page_id.id = entry.fragment)
+            ORDER BY path
+            """
+        ).fetchall(),
+        missing_toc_anchors=db.execute(
+            f"""
+            SELECT entry.page, entry.type, COUNT(*) AS entries, IFNULL(MAX(a.count), 0) AS anchors
+            FROM entry LEFT JOIN page_toc_anchors a ON a.page = entry.page AND a.type = entry.type
+            WHERE entry.type NOT IN ({",".join("?" * len(UNANCHORED_TYPES))})
+                AND entry.page IN (SELECT page FROM page)
+            GROUP BY entry.page, entry.type HAVING anchors < entries
+            ORDER BY entry.page, entry.type
+            """,
+            sorted(UNANCHORED_TYPES),
+        ).fetchall(),
+    )
+
+
+# Verify the docset, logging any problems found, and return whether there were none.
+def check_docset(documents_path: Path, indexdb_path: Path, jobs: int) -> bool:
+    started = time.perf_counter()
+    problems = verify_anchors(documents_path, indexdb_path, jobs)
+    for name, type_, path in problems.missing_pages[:DETAILED_PROBLEMS]:
+        logging.error("%s %s points at a missing page: %s", type_, name, path)
+    for name, type_, path in problems.dangling_fragments[:DETAILED_PROBLEMS]:
+        logging.error("%s %s points at a missing id: %s", type_, name, path)
+    for page, type_, entries, anchors in problems.missing_toc_anchors[
+        :DETAILED_PROBLEMS
+    ]:
+        logging.error(
+            "%s has %d %s entries but only %d ToC anchors for them",
+            page,
+            entries,
+            type_,
+            anchors,
+        )
+    logging.info(
+        "%d entries pointing at missing pages, %d at missing ids, and %d pages missing ToC anchors were found in %.2fs",
+        len(problems.missing_pages),
+        len(problems.dangling_fragments),
+        len({page for page, *_ in problems.missing_toc_anchors}),
+        time.perf_counter() - started,
+    )
+    return not problems.count()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("docset_documents_path", type=Path)
+    arg_parser.add_argument("docset_indexdb_path", type=Path)
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes to scan pages with (default: number of CPUs)",
+    )
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    if not check_docset(
+        args.docset_documents_path, args.docset_indexdb_path, args.jobs
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
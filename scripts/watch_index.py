@@ -0,0 +1,264 @@
+# Watch an (extracted) manual and the indexing code, and whenever either changes, index the
+# manual again and print how its index changed: the rows added and removed. This is for
+# iterating on the indexing rules (`handle_module`, `handle_library`, etc.) against a real
+# manual, without rebuilding the docset and diffing databases (see `make diff-dbs`) each time.
+#
+# Every page is parsed once, up front, and its tree kept in memory, as are the rows indexed
+# from it. From then on, only the pages that change on disk are parsed again. When
+# index_manual.py changes, it's reloaded, and the kept trees are indexed again, having had
+# their tweaks undone (see `Markup.undo_tweaks`). Only if the change was to how pages are
+# parsed (i.e. to `Markup`) does every page need to be parsed again.
+#
+# Changes are found by polling, so that no file-watching library is needed. Nothing is
+# written: neither the pages nor an index database.
+
+import argparse
+import importlib
+import inspect
+import logging
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+import index_manual
+from index_writer import IndexRow
+from indexing_report import mib, peak_rss
+
+logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.WARNING)
+
+# A file's modification time and size, either of which changes when it's written to.
+FileStamp = tuple[int, int]
+
+
+def file_stamp(path: Path) -> FileStamp:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+# The stamps of everything in the manual, by (internal) path.
+def file_stamps(documents_path: Path) -> dict[Path, FileStamp]:
+    stamps: dict[Path, FileStamp] = {}
+    for dirpath, _, filenames in os.walk(documents_path):
+        for filename in filenames:
+            path = Path(dirpath, filename)
+            try:
+                stamps[path.relative_to(documents_path)] = file_stamp(path)
+            except FileNotFoundError:
+                # NOTE: Removed since being listed, e.g. by an editor saving it.
+                continue
+    return stamps
+
+
+# The code that determines how pages are parsed, as opposed to how they're indexed.
+def parsing_source() -> str:
+    return inspect.getsource(index_manual.Markup) + repr(index_manual.TARGETED_ELEMENTS)
+
+
+class Update(NamedTuple):
+    entries: int
+    added: list[IndexRow]
+    removed: list[IndexRow]
+    parsed: int
+    indexed: int
+    reloaded: bool
+    seconds: float
+
+
+class WarmIndex:
+    def __init__(self, documents_path: Path, backend: str):
+        self.documents_path = documents_path
+        # NOTE: Kept as a string, since `ParserBackend` is redefined whenever the code is
+        #       reloaded.
+        self.backend = backend
+        self.code_path = Path(index_manual.__file__)
+        self.trees: dict[Path, index_manual.Markup] = {}
+        self.page_rows: dict[Path, list[IndexRow]] = {}
+        self.rows: list[IndexRow] = []
+        # What the trees and rows are up to date with.
+        self.stamps: dict[Path, FileStamp] = {}
+        self.code_stamp: FileStamp | None = None
+        self.parsing_source = parsing_source()
+        # What's left to do from an update that failed (e.g. because of an error in a rule
+        # mid-edit), which is only retried once something else changes.
+        self.unparsed: set[Path] = set()
+        self.failed = False
+        # The version of the code last loaded, and whether it loaded without error.
+        self.loaded_code_stamp = file_stamp(self.code_path)
+        self.code_loaded = True
+
+    def parse(self, internal_path: Path) -> index_manual.Markup:
+        backend = index_manual.ParserBackend(self.backend)
+        with open(
+            self.documents_path / internal_path,
+            encoding=index_manual.PAGE_ENCODING,
+            newline="",
+        ) as f:
+            return index_manual.Markup(
+                f.read(), backend, backend.default_rewrite_mode()
+            )
+
+    def index(
+        self, internal_path: Path, page_exists: Callable[[Path], bool]
+    ) -> list[IndexRow]:
+        soup = self.trees[internal_path]
+        soup.undo_tweaks()
+        index_manual.page_index_rows.clear()
+        index_manual.index_tree(soup, internal_path, page_exists)
+        rows = index_manual.page_index_rows.copy()
+        index_manual.page_index_rows.clear()
+        return rows
+
+    # Bring the trees and the index up to date with the manual and the code. Returns None if
+    # neither has changed (or if the code has, but couldn't be loaded).
+    def update(self) -> Update | None:
+        started = time.perf_counter()
+        stamps = file_stamps(self.documents_path)
+        code_stamp = file_stamp(self.code_path)
+        reloaded = code_stamp != self.loaded_code_stamp
+        if reloaded:
+            # NOTE: If the code can't be loaded (e.g. it's been saved mid-edit), that's only
+            #       reported the once, and nothing more is done until it's saved again.
+            self.loaded_code_stamp = code_stamp
+            self.code_loaded = False
+            importlib.reload(index_manual)
+            self.code_loaded = True
+        if not self.code_loaded or (
+            stamps == self.stamps and self.loaded_code_stamp == self.code_stamp
+        ):
+            return None
+
+        page_stamps = {
+            path: stamp
+            for path, stamp in stamps.items()
+            if index_manual.is_indexed_page(path)
+        }
+        source = parsing_source()
+        if source != self.parsing_source:
+            to_parse = set(page_stamps)
+        else:
+            to_parse = {
+                path
+                for path, stamp in page_stamps.items()
+                if self.stamps.get(path) != stamp or path in self.unparsed
+            }
+        # NOTE: Whether a page is indexed in full can depend on whether others exist (see
+        #       `is_duplicate_module`), so every page is indexed again if any has come or gone.
+        if (
+            self.loaded_code_stamp != self.code_stamp
+            or stamps.keys() != self.stamps.keys()
+            or self.failed
+        ):
+            to_index = set(page_stamps)
+        else:
+            to_index = to_parse
+
+        # NOTE: What the trees and rows are to be brought up to date with is recorded first,
+        #       so that if this fails, it's only reported the once, like a failure to load
+        #       the code. What's left undone is finished after the next change.
+        self.stamps = stamps
+        self.code_stamp = self.loaded_code_stamp
+        self.parsing_source = source
+        self.unparsed = set(to_parse)
+        self.failed = True
+        for path in self.trees.keys() - page_stamps.keys():
+            del self.trees[path]
+            self.page_rows.pop(path, None)
+        for path in sorted(to_parse):
+            self.trees[path] = self.parse(path)
+            self.unparsed.discard(path)
+        page_exists = frozenset(stamps).__contains__
+        for path in sorted(to_index):
+            self.page_rows[path] = self.index(path, page_exists)
+        self.failed = False
+
+        # NOTE: Pages are taken in order, and duplicate rows dropped, just as when the index
+        #       is written (see `index_docset` and `IndexWriter`).
+        previous = self.rows
+        self.rows = list(
+            dict.fromkeys(
+                row for path in sorted(self.page_rows) for row in self.page_rows[path]
+            )
+        )
+        previous_set, rows_set = set(previous), set(self.rows)
+        return Update(
+            entries=len(self.rows),
+            added=[row for row in self.rows if row not in previous_set],
+            removed=[row for row in previous if row not in rows_set],
+            parsed=len(to_parse),
+            indexed=len(to_index),
+            reloaded=reloaded,
+            seconds=time.perf_counter() - started,
+        )
+
+
+def print_update(update: Update, max_rows: int) -> None:
+    for sign, rows in [("-", update.removed), ("+", update.added)]:
+        for name, type_, path in rows[:max_rows]:
+            print(f"{sign} {name}\t{type_}\t{path}")
+        if len(rows) > max_rows:
+            print(f"{sign} ... and {len(rows) - max_rows} more")
+    print(
+        f"[{time.strftime('%H:%M:%S')}] {update.entries} entries: "
+        f"+{len(update.added)} -{len(update.removed)} "
+        f"({update.parsed} pages parsed, {update.indexed} indexed, in {update.seconds:.2f}s"
+        f"{', after reloading index_manual.py' if update.reloaded else ''})",
+        flush=True,
+    )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "documents_path",
+        type=Path,
+        help="path of a directory containing the manual, as extracted from its archive",
+    )
+    arg_parser.add_argument(
+        "--parser",
+        choices=[str(backend) for backend in index_manual.ParserBackend],
+        default=str(index_manual.ParserBackend.TARGETED),
+        help="backend to parse pages with (default: %(default)s, which keeps the smallest trees)",
+    )
+    arg_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="seconds between checks for changes (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=50,
+        help="maximum number of added (and of removed) rows to print per change (default: %(default)s)",
+    )
+    args = arg_parser.parse_args()
+    if not args.documents_path.is_dir():
+        arg_parser.error(f"no such directory: {args.documents_path}")
+
+    warm_index = WarmIndex(args.documents_path, args.parser)
+    initial = warm_index.update()
+    assert initial is not None
+    print(
+        f"{initial.entries} entries were indexed from {initial.parsed} pages in "
+        f"{initial.seconds:.2f}s (peak RSS {mib(peak_rss())}); watching "
+        f"{args.documents_path} and {warm_index.code_path} for changes",
+        flush=True,
+    )
+    try:
+        while True:
+            time.sleep(args.interval)
+            try:
+                update = warm_index.update()
+            except Exception:
+                logging.exception("couldn't index the manual")
+                continue
+            if update is not None:
+                print_update(update, args.max_rows)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()